@@ -1,21 +1,40 @@
 # tests/test_app.py
-import os, sys
+import os, re, sys, tempfile
 # ensure project root is on Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+# never touch the real instance DB from tests; to run the suite against
+# PostgreSQL, point this at an empty database, e.g.
+#   ATTENDEASE_DATABASE_URI=postgresql+psycopg://localhost/attendease_test
+os.environ.setdefault('ATTENDEASE_DATABASE_URI',
+                      'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'))
+# hash inline; test_password_hasher_pool covers the process pool
+os.environ.setdefault('ATTENDEASE_PASSWORD_HASH_WORKERS', '0')
+# run background jobs inline, writing their files under a temp dir
+os.environ.setdefault('ATTENDEASE_JOB_WORKERS', '0')
+os.environ.setdefault('ATTENDEASE_JOB_DIR', tempfile.mkdtemp())
+os.environ.setdefault('ATTENDEASE_ARCHIVE_DIR', tempfile.mkdtemp())
 
 import pytest
-from app import app, db, User, Teacher, Student, Classes, Enrollments, Attendance
+from app import app, db, hasher, request_metrics, response_cache, job_runner, create_schema, drop_schema, rebuild_rollups, DB_BACKEND, VIEWS, date_bucket, User, Teacher, Student, Classes, Enrollments, Attendance, AttendanceCounts, AttendanceSummary, AttendanceBits, ClassSessions, ArchivedTerms, save_class_attendance, teacher_dashboard_data, trend_query, user_prefix_page
+from sqlalchemy import event, func, select, text
 from werkzeug.security import generate_password_hash
+from hashing import PasswordHasher, HasherBusy
 from datetime import date
 
+# pragmas, the read engine and archive files are SQLite's; the rest of the
+# suite runs against either backend
+sqlite_only = pytest.mark.skipif(DB_BACKEND != 'sqlite', reason='SQLite backend only')
+
 @pytest.fixture
 def client():
     # configure Flask for testing
     app.config['TESTING'] = True
     with app.test_client() as client:
         with app.app_context():
-            db.drop_all()
-            db.create_all()
+            with db.engine.begin() as conn:
+                drop_schema(conn)
+            create_schema()
             # seed minimal data: one teacher
             user = User(
                 Username='t1',
@@ -31,24 +50,745 @@ def client():
         yield client
 
 def test_login_page_renders(client):
-    rv = client.get('/login')
-    assert b'<h2>Login</h2>' in rv.data
+    rv = client.get('/login/teacher')
+    assert b'<h2>Teacher Login</h2>' in rv.data
 
 def test_invalid_login_shows_error(client):
-    rv = client.post('/login',
+    rv = client.post('/login/teacher',
                      data={'username':'wrong','password':'wrong'},
                      follow_redirects=True)
-    assert b'Invalid username or password' in rv.data
+    assert b'Invalid credentials or wrong role' in rv.data
 
 def test_teacher_login_and_dashboard(client):
     # login with seeded user
-    rv = client.post('/login',
+    rv = client.post('/login/teacher',
                      data={'username':'t1','password':'pw'},
                      follow_redirects=True)
-    # should land on the dashboard showing "Your Classes"
-    assert b'Your Classes' in rv.data
+    # should land on the dashboard showing "Your Courses"
+    assert b'Your Courses' in rv.data
 
 def test_take_attendance_requires_login(client):
-    # unauthenticated access should redirect to login
+    # unauthenticated access should redirect to role selection
     rv = client.get('/class/1/attendance', follow_redirects=True)
-    assert b'<h2>Login</h2>' in rv.data
+    assert b'Please choose your role' in rv.data
+
+def make_class(n_students, teacher_id=1):
+    cls = Classes(ClassName='CSC 1001', TeacherID=teacher_id)
+    db.session.add(cls)
+    db.session.commit()
+    for i in range(n_students):
+        u = User(Username=f's{i}', Password='x', Name=f'Student {i}', Role_Type='student')
+        db.session.add(u)
+        db.session.flush()
+        db.session.add(Student(UserID=u.UserID, EnrollmentDate=date.today()))
+        db.session.add(Enrollments(StudentID=u.UserID, ClassID=cls.ClassID, Status='active'))
+    db.session.commit()
+    return cls.ClassID
+
+def login_as(client, user_id, role):
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['role'] = role
+
+def test_take_attendance_bulk_upsert(client):
+    with app.app_context():
+        class_id = make_class(3)
+        eids = [e.EnrollmentID for e in Enrollments.query.order_by(Enrollments.EnrollmentID)]
+    login_as(client, 1, 'teacher')
+    url = f'/class/{class_id}/attendance/2025-01-06'
+    client.post(url, data={f'status_{eids[0]}': 'present'})
+    # resubmitting the same date updates in place instead of duplicating
+    client.post(url, data={f'status_{eids[0]}': 'absent', f'status_{eids[1]}': 'present'})
+    with app.app_context():
+        rows = dict(db.session.query(Attendance.EnrollmentID, Attendance.Status))
+    assert rows == {eids[0]: 'absent', eids[1]: 'present', eids[2]: 'absent'}
+
+def test_take_attendance_roster_shows_saved_status(client):
+    with app.app_context():
+        class_id = make_class(2)
+        eid, other = [e.EnrollmentID for e in Enrollments.query.order_by(Enrollments.EnrollmentID)]
+    login_as(client, 1, 'teacher')
+    client.post(f'/class/{class_id}/attendance/2025-01-06', data={f'status_{eid}': 'present'})
+    page = client.get(f'/class/{class_id}/attendance/2025-01-06').get_data(as_text=True)
+    assert 'Student 0' in page and 'Student 1' in page
+    assert page.count('selected') == 2
+    assert page.index(f'status_{eid}') < page.index('value="present"  selected') < page.index(f'status_{other}')
+    # another day has nothing recorded yet
+    page = client.get(f'/class/{class_id}/attendance/2025-01-07').get_data(as_text=True)
+    assert 'selected' not in page
+
+def test_student_dashboard_reads_counters(client):
+    with app.app_context():
+        class_id = make_class(2)
+        eid, other = [e.EnrollmentID for e in Enrollments.query.order_by(Enrollments.EnrollmentID)]
+        sid = db.session.get(Enrollments, eid).StudentID
+    login_as(client, 1, 'teacher')
+    for day in ('2025-01-06', '2025-01-07', '2025-01-08'):
+        client.post(f'/class/{class_id}/attendance/{day}', data={f'status_{other}': 'present'})
+    # flipping a saved day back to present decrements the counter
+    client.post(f'/class/{class_id}/attendance/2025-01-08',
+                data={f'status_{eid}': 'present', f'status_{other}': 'present'})
+    login_as(client, sid, 'student')
+    rv = client.get('/dashboard')
+    assert b'Days Absent: <strong>2</strong>' in rv.data
+    with app.app_context():
+        counts = db.session.get(AttendanceCounts, eid)
+        assert (counts.PresentCount, counts.AbsentCount, counts.TotalCount) == (1, 2, 3)
+
+def test_report_summary_reads_rollup(client):
+    with app.app_context():
+        class_id = make_class(2)
+        eid, other = [e.EnrollmentID for e in Enrollments.query.order_by(Enrollments.EnrollmentID)]
+    login_as(client, 1, 'teacher')
+    for day in ('2025-01-06', '2025-01-07', '2025-01-08'):
+        client.post(f'/class/{class_id}/attendance/{day}', data={f'status_{eid}': 'present'})
+    client.post(f'/class/{class_id}/attendance/2025-01-08', data={})
+    rv = client.get(f'/reports/summary?class_id={class_id}&export=csv')
+    lines = rv.data.decode().splitlines()
+    # percentages are real-valued, not truncated by integer division
+    assert lines[1].startswith('CSC 1001,Student 0,2,3,66.66')
+    assert lines[2] == 'CSC 1001,Student 1,0,3,0.0'
+    with app.app_context():
+        before = sorted(tuple(r) for r in db.session.query(AttendanceSummary.PresentCount,
+                                                            AttendanceSummary.TotalCount))
+        db.session.execute(AttendanceSummary.__table__.delete())
+        rebuild_rollups()
+        after = sorted(tuple(r) for r in db.session.query(AttendanceSummary.PresentCount,
+                                                           AttendanceSummary.TotalCount))
+        assert before == after
+
+def test_report_summary_date_range(client):
+    # a date range totals the raw rows: the page, the CSV and a background job
+    with app.app_context():
+        class_id = make_class(2)
+        eid, other = [e.EnrollmentID for e in Enrollments.query.order_by(Enrollments.EnrollmentID)]
+    login_as(client, 1, 'teacher')
+    for day in ('2025-01-06', '2025-01-07', '2025-01-08'):
+        client.post(f'/class/{class_id}/attendance/{day}', data={f'status_{eid}': 'present'})
+    client.post(f'/class/{class_id}/attendance/2025-01-09', data={})
+    dates = 'start=2025-01-07&end=2025-01-09'
+    page = client.get(f'/reports/summary?class_id={class_id}&{dates}').get_data(as_text=True)
+    assert 'Student 0' in page
+    assert '<title>AttendEase • Attendance Summary Report</title>' in page
+    assert page.count('typeahead for the student filter') == 1
+    rv = client.get(f'/reports/summary?class_id={class_id}&{dates}&export=csv')
+    lines = rv.get_data(as_text=True).splitlines()
+    assert lines[1].startswith('CSC 1001,Student 0,2,3,66.66')
+    assert lines[2] == 'CSC 1001,Student 1,0,3,0.0'
+    login_as(client, 1, 'admin')
+    job = client.post('/admin/jobs', headers={'Accept': 'application/json'},
+                      data={'kind': 'csv', 'class_id': class_id, 'student_name': '',
+                            'start': '2025-01-07', 'end': '2025-01-09'}).get_json()
+    assert job['status'] == 'done' and job['rows'] == 2
+
+def test_deleting_enrollment_updates_rollups(client):
+    with app.app_context():
+        class_id = make_class(1)
+        eid = Enrollments.query.first().EnrollmentID
+    login_as(client, 1, 'teacher')
+    client.post(f'/class/{class_id}/attendance/2025-01-06', data={f'status_{eid}': 'present'})
+    with app.app_context():
+        db.session.execute(Enrollments.__table__.delete())
+        db.session.commit()
+        assert db.session.query(AttendanceCounts).count() == 0
+        assert db.session.query(func.sum(AttendanceSummary.TotalCount)).scalar() == 0
+
+def test_history_export_streams_per_date_rows(client):
+    with app.app_context():
+        class_id = make_class(2)
+        eid = Enrollments.query.order_by(Enrollments.EnrollmentID).first().EnrollmentID
+    login_as(client, 1, 'teacher')
+    for day in ('2025-01-06', '2025-01-07'):
+        client.post(f'/class/{class_id}/attendance/{day}', data={f'status_{eid}': 'present'})
+    rv = client.get(f'/reports/summary?class_id={class_id}&student_name=Student 0&export=history')
+    assert rv.is_streamed
+    assert rv.headers['Content-Disposition'] == 'attachment; filename=attendance_history.csv'
+    assert sorted(rv.get_data(as_text=True).splitlines()[1:]) == [
+        'CSC 1001,Student 0,2025-01-06,present',
+        'CSC 1001,Student 0,2025-01-07,present',
+    ]
+
+def test_admin_users_keyset_pages(client):
+    with app.app_context():
+        make_class(60)
+    login_as(client, 1, 'admin')
+    rv = client.get('/admin/users?role=student')
+    assert rv.data.count(b'btn-outline-danger') == 50
+    # the teacher is UserID 1, so the 50th student is UserID 51
+    assert b'after=51' in rv.data
+    rv = client.get('/admin/users?role=student&after=51')
+    assert rv.data.count(b'btn-outline-danger') == 10
+    assert b'Next' not in rv.data
+    rv = client.get('/admin/users?q=student 5')
+    assert rv.data.count(b'btn-outline-danger') == 11
+    # both sides ignore case; 's12' sorts before 'student 12', so each
+    # student is listed once, under its username
+    rv = client.get('/admin/users?q=S&role=student')
+    assert rv.data.count(b'btn-outline-danger') == 50
+    assert b'after_key=s53' in rv.data
+    first = set(re.findall(rb'name="user_ids" value="(\d+)"', rv.data))
+    assert len(first) == 50
+    rv = client.get('/admin/users?q=S&role=student&after_key=s53&after=55')
+    assert rv.data.count(b'btn-outline-danger') == 10
+    assert not first & set(re.findall(rb'name="user_ids" value="(\d+)"', rv.data))
+    assert b'Next' not in rv.data
+
+@sqlite_only
+def test_admin_users_search_walks_prefix_indexes(client):
+    with app.app_context():
+        make_class(3)
+        statements = []
+        def capture(conn, cursor, statement, params, context, executemany):
+            statements.append((statement, params))
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            user_prefix_page('stu', 'student', 's1', 3)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        statement, params = statements[-1]
+        plan = ' '.join(r[3] for r in db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, params))
+    assert 'USING INDEX ix_users_lower_name_userid (<expr>>? AND <expr><?)' in plan
+    assert 'USING INDEX ix_users_lower_username_userid (<expr>>? AND <expr><?)' in plan
+    assert 'rowid>?' not in plan and 'ix_users_role_userid' not in plan
+
+def test_user_search_uses_trigram_index(client):
+    with app.app_context():
+        make_class(12)
+        user = db.session.get(User, 5)
+        user.Name = 'Zoë Quartermaine'
+        db.session.commit()
+    login_as(client, 1, 'admin')
+    rv = client.get('/users/lookup?q=termai')
+    assert [u['UserID'] for u in rv.get_json()] == [5]
+    rv = client.get('/users/lookup?q=dent 1&role=student')
+    assert sorted(u['Name'] for u in rv.get_json()) == ['Student 1', 'Student 10', 'Student 11']
+    # renamed users drop out of the index under their old name
+    assert client.get('/users/lookup?q=Student 3').get_json() == []
+
+@sqlite_only
+def test_sqlite_engine_profile(client):
+    with app.app_context():
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert db.session.execute(text('PRAGMA foreign_keys')).scalar() == 1
+        with db.engines['read'].connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA query_only').scalar() == 1
+    # GET selects are routed to the query_only engine
+    with app.test_request_context('/reports/summary'):
+        assert db.session.get_bind(clause=select(User)) is db.engines['read']
+    with app.test_request_context('/reports/summary', method='POST'):
+        assert db.session.get_bind(clause=select(User)) is db.engine
+
+def test_login_rehashes_outdated_password(client):
+    with app.app_context():
+        user = db.session.get(User, 1)
+        user.Password = generate_password_hash('pw', 'pbkdf2:sha256:1000')
+        db.session.commit()
+    rv = client.post('/login/teacher', data={'username': 't1', 'password': 'pw'})
+    assert rv.status_code == 302
+    with app.app_context():
+        stored = db.session.get(User, 1).Password
+        assert not hasher.needs_rehash(stored)
+        assert hasher.verify(stored, 'pw')
+
+def test_password_hasher_pool():
+    pool = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_pending=1, timeout=0)
+    try:
+        pwhash = pool.hash('secret')
+        assert pwhash.startswith('pbkdf2:sha256:1000$')
+        assert pool.verify(pwhash, 'secret') and not pool.verify(pwhash, 'nope')
+        # a saturated pool pushes back instead of queueing without bound
+        pool._slots.acquire()
+        with pytest.raises(HasherBusy):
+            pool.hash('secret')
+    finally:
+        pool.shutdown()
+
+def test_generate_dataset_is_deterministic(client):
+    from seed_data import generate_dataset
+    def snapshot():
+        generate_dataset(students=30, classes=6, teachers=2, per_student=3, days=21,
+                         start=date(2025, 1, 6), seed=42, log=lambda msg: None)
+        return (db.session.query(User.Name).order_by(User.UserID).all(),
+                db.session.query(Attendance.EnrollmentID, Attendance.Date, Attendance.Status)
+                          .order_by(Attendance.EnrollmentID, Attendance.Date).all())
+    with app.app_context():
+        first = snapshot()
+        db.session.remove()
+        assert snapshot() == first
+        # 21 days from a Monday = 6 or 9 sessions per class, depending on its schedule
+        assert db.session.query(Enrollments).count() == 90
+        assert len(first[1]) == db.session.query(func.sum(AttendanceSummary.TotalCount)).scalar()
+
+def test_class_sessions_calendar(client):
+    with app.app_context():
+        class_id = make_class(2)
+        eids = [e.EnrollmentID for e in Enrollments.query.filter_by(ClassID=class_id)]
+        for day in range(1, 8):
+            save_class_attendance(class_id, date(2025, 1, day), {eids[0]: 'present'})
+        db.session.commit()
+        assert ClassSessions.query.filter_by(ClassID=class_id).count() == 7
+    login_as(client, 1, 'teacher')
+    body = client.get('/dashboard').get_data(as_text=True)
+    assert '2025-01-07' in body and '2025-01-02' not in body   # only the latest few
+    first = client.get(f'/class/{class_id}/sessions?format=json&end=2025-01-06').get_json()
+    assert first['dates'][0] == '2025-01-06'
+    page = client.get(f'/class/{class_id}/sessions?format=json&before=2025-01-03').get_json()
+    assert page == {'class_id': class_id, 'dates': ['2025-01-02', '2025-01-01'], 'next_before': None}
+    assert b'2025-01-05' in client.get(f'/class/{class_id}/sessions').data
+    with app.app_context():
+        # a class with fewer sessions than RECENT_SESSIONS shows them all
+        other = Classes(ClassName='CSC 1002', TeacherID=1)
+        db.session.add(other)
+        db.session.flush()
+        db.session.add_all(ClassSessions(ClassID=other.ClassID, Date=date(2025, 1, d)) for d in (3, 4))
+        db.session.commit()
+        assert teacher_dashboard_data(1)['recent_dates'] == {
+            class_id: [date(2025, 1, d) for d in (7, 6, 5, 4, 3)],
+            other.ClassID: [date(2025, 1, 4), date(2025, 1, 3)]}
+
+def test_response_cache_versions(client):
+    with app.app_context():
+        first, second = make_class(2), make_class(0)
+        eids = [e.EnrollmentID for e in Enrollments.query.filter_by(ClassID=first)]
+    response_cache.reset()
+    login_as(client, 1, 'admin')
+    client.get(f'/reports/summary?class_id={second}')
+    client.get(f'/reports/summary?class_id={first}')
+    client.get(f'/reports/summary?class_id={first}')
+    assert response_cache.stats()['report_summary'] == {'misses': 2, 'hits': 1}
+
+    # saving attendance for `first` refreshes its report and the student's dashboard
+    login_as(client, 1, 'teacher')
+    client.post(f'/class/{first}/attendance/2025-01-06', data={f'status_{eids[0]}': 'present'})
+    login_as(client, 1, 'admin')
+    assert b'100.0' in client.get(f'/reports/summary?class_id={first}').data
+    client.get(f'/reports/summary?class_id={second}')
+    assert response_cache.stats()['report_summary'] == {'misses': 3, 'hits': 2}
+
+    # renaming a student is visible in the next report
+    client.post('/admin/users/edit/2', data={'username': 's0', 'name': 'Renamed', 'role': 'student'})
+    assert b'Renamed' in client.get(f'/reports/summary?class_id={first}').data
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'attendease_cache_hits_total{cache="report_summary"} 2' in body
+
+def test_memory_backend_lru():
+    from cache import MemoryBackend
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', 1); backend.set('b', 2)
+    backend.get('a')
+    backend.set('c', 3)
+    assert (backend.get('a'), backend.get('b'), backend.get('c')) == (1, None, 3)
+    backend.bump(['class:1'])
+    assert backend.versions(['class:1', 'class:2']) == [1, 0]
+
+def test_cache_versions_shared_between_processes(client):
+    # another worker's cache: its own payloads, the same versions table
+    from cache import ResponseCache, MemoryBackend, SQLVersions
+    with app.app_context():
+        other = ResponseCache(MemoryBackend(), versions=SQLVersions(lambda: db.engine))
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+        assert other.get_or_compute('report', None, ['class:1'], compute) == 1
+        assert other.get_or_compute('report', None, ['class:1'], compute) == 1
+        # a CLI write bumps through its own ResponseCache...
+        assert app.test_cli_runner().invoke(args=['rebuild-rollups']).exit_code == 0
+        # ...and this one sees it
+        assert other.get_or_compute('report', None, ['class:1'], compute) == 2
+        response_cache.bump('class:1')
+        assert other.get_or_compute('report', None, ['class:1'], compute) == 3
+        assert other.get_or_compute('report', None, ['class:2'], compute) == 4
+
+def test_bulk_attendance_import(client, tmp_path):
+    with app.app_context():
+        class_id = make_class(3)
+    login_as(client, 1, 'teacher')
+    ndjson = '\n'.join([
+        '{"username": "s0", "class": "CSC 1001", "date": "2025-01-06", "status": "present"}',
+        '{"username": "s1", "class": %d, "date": "2025-01-06", "status": "absent"}' % class_id,
+        '{"username": "s0", "class": "CSC 1001", "date": "2025-01-07", "status": "Present"}',
+        '{"username": "s2", "class": "CSC 1001", "date": "2025-01-06", "status": "late"}',
+        '{"username": "nobody", "class": "CSC 1001", "date": "2025-01-06", "status": "present"}',
+        '{"username": "s2", "class": "CSC 1001", "date": "06/01/2025", "status": "present"}',
+        'not json',
+    ])
+    report = client.post('/api/attendance/import', data=ndjson,
+                         content_type='application/x-ndjson').get_json()
+    assert (report['received'], report['imported'], report['failed']) == (7, 3, 4)
+    assert [e['line'] for e in report['errors']] == [4, 5, 6, 7]
+
+    # a second import flips one status: the set-based rollup deltas must
+    # agree with a full rebuild
+    csv_file = tmp_path / 'lms.csv'
+    csv_file.write_text('username,class,date,status\n'
+                        f's0,{class_id},2025-01-06,absent\n'
+                        f's2,{class_id},2025-01-08,present\n')
+    result = app.test_cli_runner().invoke(args=['import-attendance', str(csv_file)])
+    assert 'Imported 2 of 2 records' in result.output
+    totals = select(func.sum(AttendanceSummary.PresentCount), func.sum(AttendanceSummary.AbsentCount),
+                    func.sum(AttendanceSummary.TotalCount))
+    with app.app_context():
+        assert tuple(db.session.execute(totals).one()) == (2, 2, 4)
+        rebuild_rollups()
+        assert tuple(db.session.execute(totals).one()) == (2, 2, 4)
+        assert ClassSessions.query.count() == 3
+        assert db.session.execute(text('SELECT COUNT(*) FROM RollupDeferred')).scalar() == 0
+
+def test_roster_import_validates_whole_file(client, tmp_path):
+    import io
+    with app.app_context():
+        first, second = make_class(0), make_class(0)
+    login_as(client, 1, 'admin')
+    bad = ('username,password,name,role,classes\n'
+           f'n1,pw,New One,student,{first};{second}\n'
+           'n1,pw,Duplicate,student,\n'
+           'n3,pw,Bad Class,student,NOPE 999\n')
+    rv = client.post('/admin/users/import', data={'roster': (io.BytesIO(bad.encode()), 'r.csv')})
+    assert b'nothing was imported' in rv.data and b'already exists' in rv.data
+    with app.app_context():
+        assert User.query.filter_by(Username='n1').count() == 0
+
+    ndjson = tmp_path / 'roster.ndjson'
+    ndjson.write_text(
+        '{"username": "n1", "password": "pw", "name": "New One", "role": "student", "classes": [%d, %d]}\n'
+        '{"username": "n2", "password": "pw", "name": "New Two", "role": "teacher", "department": "Math"}\n'
+        % (first, second))
+    runner = app.test_cli_runner()
+    assert 'Would create 2 accounts and 2 enrollments' in \
+        runner.invoke(args=['import-roster', '--dry-run', str(ndjson)]).output
+    with app.app_context():
+        assert User.query.count() == 1
+    result = runner.invoke(args=['import-roster', '--chunk-size', '1', str(ndjson)])
+    assert 'Created 2 accounts and 2 enrollments' in result.output
+    with app.app_context():
+        n1 = User.query.filter_by(Username='n1').one()
+        assert hasher.verify(n1.Password, 'pw')
+        assert sorted(e.ClassID for e in n1.student.enrollments) == [first, second]
+        assert User.query.filter_by(Username='n2').one().teacher.Department == 'Math'
+
+def test_cli_imports_invalidate_server_cache(client, tmp_path):
+    # the imports run in their own process, as from cron; this process's
+    # cached payloads must still go stale
+    import subprocess
+    flask = lambda *args: subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', *args],
+                                         cwd=app.root_path, capture_output=True, text=True,
+                                         check=True).stdout
+    with app.app_context():
+        class_id = make_class(1)
+        sid = Enrollments.query.one().StudentID
+    login_as(client, sid, 'student')
+    assert b'Days Absent: <strong>0</strong>' in client.get('/dashboard').data
+    (tmp_path / 'lms.ndjson').write_text(
+        '{"username": "s0", "class": "CSC 1001", "date": "2025-01-06", "status": "absent"}\n')
+    assert 'Imported 1 of 1 records' in flask('import-attendance', str(tmp_path / 'lms.ndjson'))
+    assert b'Days Absent: <strong>1</strong>' in client.get('/dashboard').data
+
+    with app.app_context():
+        tag = response_cache.version_tag([f'class:{class_id}'])
+    (tmp_path / 'roster.csv').write_text(f'username,password,name,role,classes\nn1,pw,New One,student,{class_id}\n')
+    assert 'Created 1 accounts' in flask('import-roster', str(tmp_path / 'roster.csv'))
+    with app.app_context():
+        assert response_cache.version_tag([f'class:{class_id}']) != tag
+
+def test_set_based_deletes(client):
+    from sqlalchemy import event
+    with app.app_context():
+        first, second = make_class(3), make_class(0)
+        # s1 and s2 also take the second class
+        db.session.add_all([Enrollments(StudentID=uid, ClassID=second) for uid in (3, 4)])
+        db.session.get(User, 3).Password = hasher.hash('pw')
+        for class_id in (first, second):
+            for day in range(1, 11):
+                save_class_attendance(class_id, date(2025, 1, day), {})
+        db.session.commit()
+        student = 2     # s0, only in the first class
+    statements = []
+    count = lambda *args: statements.append(args[2])
+    login_as(client, 1, 'admin')
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        client.post(f'/admin/users/delete/{student}')
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', count)
+    # a fixed number of statements, not one per enrollment or attendance row
+    assert len(statements) <= 20
+    assert not any(s.startswith('SELECT') and 'Attendance' in s for s in statements)
+
+    client.post(f'/admin/classes/delete/{second}')
+    totals = select(func.count(), func.sum(AttendanceSummary.TotalCount))
+    with app.app_context():
+        assert db.session.get(User, student) is None
+        assert Attendance.query.count() == 20           # two students left in `first`
+        assert tuple(db.session.execute(totals).one()) == (2, 20)
+        rebuild_rollups()
+        assert tuple(db.session.execute(totals).one()) == (2, 20)
+        assert {c for (c,) in db.session.query(ClassSessions.ClassID).distinct()} == {first}
+
+    assert client.post('/login/student', data={'username': 's1', 'password': 'pw'}).status_code == 302
+    login_as(client, 1, 'admin')
+    client.post('/admin/users/bulk', data={'action': 'deactivate', 'user_ids': [3]})
+    rv = client.post('/login/student', data={'username': 's1', 'password': 'pw'})
+    assert rv.status_code == 200 and b'Invalid' in rv.data
+
+    # a session signed in before the deactivation ends on its next request
+    other = app.test_client()
+    login_as(other, 4, 'student')
+    assert other.get('/dashboard').status_code == 200
+    client.post('/admin/users/bulk', data={'action': 'deactivate', 'user_ids': [4]})
+    rv = other.get('/dashboard')
+    assert rv.status_code == 302 and rv.headers['Location'].endswith('/')
+    with other.session_transaction() as sess:
+        assert 'user_id' not in sess
+
+def test_background_export_jobs(client):
+    with app.app_context():
+        class_id = make_class(2)
+        eid = Enrollments.query.order_by(Enrollments.EnrollmentID).first().EnrollmentID
+    login_as(client, 1, 'teacher')
+    client.post(f'/class/{class_id}/attendance/2025-01-06', data={f'status_{eid}': 'present'})
+    login_as(client, 1, 'admin')
+    form = {'kind': 'history', 'class_id': class_id, 'student_name': ''}
+    json_only = {'Accept': 'application/json'}
+    job = client.post('/admin/jobs', data=form, headers=json_only).get_json()
+    assert job['status'] == 'done' and job['rows'] == 2
+    assert client.get(f'/admin/jobs/{job["job_id"]}').get_json()['status'] == 'done'
+    rv = client.get(job['download'])
+    assert rv.headers['Content-Disposition'] == 'attachment; filename=attendance_history.csv'
+    assert sorted(rv.get_data(as_text=True).splitlines()[1:]) == [
+        'CSC 1001,Student 0,2025-01-06,present',
+        'CSC 1001,Student 1,2025-01-06,absent',
+    ]
+    rv.close()
+    # same filters over unchanged data reuse the finished file
+    assert client.post('/admin/jobs', data=form, headers=json_only).get_json()['job_id'] == job['job_id']
+    # new attendance for the class changes the key, so the export runs again
+    login_as(client, 1, 'teacher')
+    client.post(f'/class/{class_id}/attendance/2025-01-07', data={})
+    login_as(client, 1, 'admin')
+    again = client.post('/admin/jobs', data=form, headers=json_only).get_json()
+    assert again['job_id'] != job['job_id'] and again['rows'] == 4
+    assert b'attendance_history.csv' in client.get('/admin/jobs').data
+
+def test_export_jobs_rerun_with_cache_disabled(client):
+    with app.app_context():
+        class_id = make_class(1)
+        eid = Enrollments.query.one().EnrollmentID
+    form = {'kind': 'history', 'class_id': class_id, 'student_name': ''}
+    json_only = {'Accept': 'application/json'}
+    response_cache.enabled = False
+    try:
+        login_as(client, 1, 'admin')
+        job = client.post('/admin/jobs', data=form, headers=json_only).get_json()
+        login_as(client, 1, 'teacher')
+        client.post(f'/class/{class_id}/attendance/2025-01-06', data={f'status_{eid}': 'present'})
+        login_as(client, 1, 'admin')
+        again = client.post('/admin/jobs', data=form, headers=json_only).get_json()
+    finally:
+        response_cache.enabled = True
+    assert again['job_id'] != job['job_id'] and (job['rows'], again['rows']) == (0, 1)
+
+def test_pruned_export_job_expires(client):
+    with app.app_context():
+        class_id = make_class(1)
+    login_as(client, 1, 'admin')
+    job = client.post('/admin/jobs', headers={'Accept': 'application/json'},
+                      data={'kind': 'csv', 'class_id': class_id, 'student_name': ''}).get_json()
+    assert job['status'] == 'done' and job['download']
+    ttl, job_runner.ttl = job_runner.ttl, -1
+    try:
+        job_runner.prune()
+    finally:
+        job_runner.ttl = ttl
+    status = client.get(f'/admin/jobs/{job["job_id"]}').get_json()
+    assert status['status'] == 'expired' and status['download'] is None
+    assert client.get(job['download']).status_code == 404
+    page = client.get('/admin/jobs').get_data(as_text=True)
+    assert 'expired' in page and 'Download' not in page
+
+@sqlite_only
+def test_archive_term(client):
+    from archive import archive_term
+    with app.app_context():
+        class_id = make_class(2)
+        eid = Enrollments.query.order_by(Enrollments.EnrollmentID).first().EnrollmentID
+    login_as(client, 1, 'teacher')
+    for day in ('2025-01-06', '2025-01-07', '2025-03-03'):
+        client.post(f'/class/{class_id}/attendance/{day}', data={f'status_{eid}': 'present'})
+    with app.app_context():
+        term = archive_term('Winter 2025', date(2025, 1, 1), date(2025, 1, 31))
+        assert term.Rows == 4 and os.path.exists(os.path.join(app.config['ARCHIVE_DIR'], 'Winter_2025.db'))
+        assert Attendance.query.count() == 2
+        assert [c.TotalCount for c in AttendanceCounts.query] == [1, 1]
+        assert {d for (d,) in db.session.query(ClassSessions.Date)} == {date(2025, 3, 3)}
+        with pytest.raises(ValueError):
+            archive_term('Overlap', date(2025, 1, 15), date(2025, 2, 15))
+    # without a range the report covers open terms only...
+    login_as(client, 1, 'admin')
+    rv = client.get(f'/reports/summary?class_id={class_id}&export=csv')
+    assert rv.get_data(as_text=True).splitlines()[1] == 'CSC 1001,Student 0,1,1,100.0'
+    # ...and a range reaching into the archived term reads its file too
+    rv = client.get(f'/reports/summary?class_id={class_id}&export=csv&start=2025-01-01')
+    assert rv.get_data(as_text=True).splitlines()[1] == 'CSC 1001,Student 0,3,3,100.0'
+    rv = client.get(f'/reports/summary?student_name=Student 1&export=history&end=2025-01-06')
+    assert rv.get_data(as_text=True).splitlines()[1:] == ['CSC 1001,Student 1,2025-01-06,absent']
+    # the archived dates are read-only
+    login_as(client, 1, 'teacher')
+    rv = client.post(f'/class/{class_id}/attendance/2025-01-08', data={}, follow_redirects=True)
+    assert b'archived term' in rv.data
+    with app.app_context():
+        assert Attendance.query.count() == 2
+
+@sqlite_only
+def test_archive_term_rejects_writes_while_copying(client, monkeypatch):
+    import archive
+    with app.app_context():
+        class_id = make_class(1)
+        eid = Enrollments.query.one().EnrollmentID
+    login_as(client, 1, 'teacher')
+    client.post(f'/class/{class_id}/attendance/2025-01-06', data={f'status_{eid}': 'present'})
+    # writes from another connection after the copy, before the hot rows are released
+    from sqlalchemy.exc import IntegrityError
+    replace, saved = os.replace, []
+    def save_then_replace(src, dst):
+        for day in (date(2025, 1, 7), date(2025, 2, 3)):
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(Attendance.__table__.insert(),
+                                 {'EnrollmentID': eid, 'Date': day, 'Status': 'present'})
+                saved.append(True)
+            except IntegrityError:
+                saved.append(False)
+        replace(src, dst)
+    monkeypatch.setattr(archive.os, 'replace', save_then_replace)
+    with app.app_context():
+        term = archive.archive_term('Winter 2025', date(2025, 1, 1), date(2025, 1, 31))
+        # the claimed term turned the January row away instead of losing it
+        assert saved == [False, True]
+        assert term.Rows == 1
+        assert [d for (d,) in db.session.query(Attendance.Date)] == [date(2025, 2, 3)]
+    # a failed attempt gives the dates back
+    def fail(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr(archive.os, 'replace', fail)
+    with app.app_context():
+        with pytest.raises(OSError):
+            archive.archive_term('February 2025', date(2025, 2, 1), date(2025, 2, 28))
+        assert [t.Name for t in ArchivedTerms.query] == ['Winter 2025']
+        assert Attendance.query.count() == 1
+
+def test_attendance_bits_analytics(client, tmp_path):
+    from analytics import enrollment_stats, at_risk
+    with app.app_context():
+        class_id = make_class(3)
+        e0, e1, e2 = [e.EnrollmentID for e in Enrollments.query.order_by(Enrollments.EnrollmentID)]
+    login_as(client, 1, 'teacher')
+    # s0 always present; s1 absent for the last three sessions, across a
+    # month boundary; s2 absent, present, absent, absent, present
+    days = ['2025-01-27', '2025-01-29', '2025-01-31', '2025-02-03', '2025-02-05']
+    for i, day in enumerate(days):
+        marks = {e0: 'present'}
+        if i < 2:
+            marks[e1] = 'present'
+        if i in (1, 4):
+            marks[e2] = 'present'
+        client.post(f'/class/{class_id}/attendance/{day}', data={f'status_{e}': v for e, v in marks.items()})
+    # the bulk path keeps the bitsets too: mark s1 present on the 31st
+    (tmp_path / 'fix.ndjson').write_text(
+        '{"username": "s1", "class": "CSC 1001", "date": "2025-01-31", "status": "present"}\n')
+    assert app.test_cli_runner().invoke(args=['import-attendance', str(tmp_path / 'fix.ndjson')]).exit_code == 0
+    with app.app_context():
+        stats = {s.EnrollmentID: s for s in enrollment_stats([class_id])}
+        assert [(stats[e].Present, stats[e].Sessions, stats[e].LongestAbsence) for e in (e0, e1, e2)] == \
+               [(5, 5, 0), (3, 5, 2), (2, 5, 2)]
+        assert [s.EnrollmentID for s in at_risk(0.5)] == [e2]
+        # the rate filter runs first; streaks are only worked out for what passes it
+        assert enrollment_stats([class_id], below=0.7) == [stats[e1], stats[e2]]
+        before = sorted(tuple(r) for r in db.session.query(
+            AttendanceBits.EnrollmentID, AttendanceBits.Month, AttendanceBits.Held, AttendanceBits.Present))
+        rebuild_rollups()
+        after = sorted(tuple(r) for r in db.session.query(
+            AttendanceBits.EnrollmentID, AttendanceBits.Month, AttendanceBits.Held, AttendanceBits.Present))
+        assert before == after and len(after) == 6
+    rv = client.get(f'/reports/at-risk?class_id={class_id}&threshold=0.7&format=json')
+    assert [s['StudentName'] for s in rv.get_json()['students']] == ['Student 2', 'Student 1']
+
+def test_class_sessions_trend(client, tmp_path):
+    with app.app_context():
+        class_id = make_class(3)
+        e0, e1, e2 = [e.EnrollmentID for e in Enrollments.query.order_by(Enrollments.EnrollmentID)]
+    login_as(client, 1, 'teacher')
+    # Mon 6th (saved twice, the second save wins) and Wed 8th, then Mon 13th
+    client.post(f'/class/{class_id}/attendance/2025-01-06', data={f'status_{e0}': 'present'})
+    client.post(f'/class/{class_id}/attendance/2025-01-08', data={f'status_{e0}': 'present', f'status_{e1}': 'present'})
+    client.post(f'/class/{class_id}/attendance/2025-01-06', data={f'status_{e1}': 'present'})
+    (tmp_path / 'more.ndjson').write_text(
+        '{"username": "s2", "class": "CSC 1001", "date": "2025-01-13", "status": "present"}\n'
+        '{"username": "s0", "class": "CSC 1001", "date": "2025-01-13", "status": "absent"}\n')
+    assert app.test_cli_runner().invoke(args=['import-attendance', str(tmp_path / 'more.ndjson')]).exit_code == 0
+    rv = client.get('/reports/trend?start=2025-01-01&end=2025-01-31&bucket=week&format=json')
+    assert [(p['period'], p['sessions'], p['present'], p['absent']) for p in rv.get_json()['periods']] == \
+           [('2025-01-06', 2, 3, 3), ('2025-01-13', 1, 1, 1)]
+    rv = client.get('/reports/trend?start=2025-01-01&end=2025-01-31&bucket=month&format=json')
+    assert [(p['period'], p['sessions'], p['present']) for p in rv.get_json()['periods']] == [('2025-01-01', 3, 4)]
+    assert b'2025-01-06' in client.get('/reports/trend?start=2025-01-01&end=2025-01-31').data
+
+    sessions = lambda: sorted(tuple(r) for r in db.session.query(
+        ClassSessions.ClassID, ClassSessions.Date, ClassSessions.PresentCount, ClassSessions.AbsentCount))
+    with app.app_context():
+        before = sessions()
+        rebuild_rollups()
+        assert sessions() == before
+        if DB_BACKEND == 'sqlite':
+            plan = ' '.join(str(r[-1]) for r in db.session.execute(text(
+                'EXPLAIN QUERY PLAN ' + str(trend_query('week', date(2025, 1, 1), date(2025, 1, 31))
+                                            .statement.compile(compile_kwargs={'literal_binds': True})))))
+            assert 'ix_class_sessions_date' in plan and 'Attendance' not in plan
+    # deleting s0 takes their marks back out of the daily totals
+    login_as(client, 1, 'admin')
+    client.post('/admin/users/delete/2')
+    with app.app_context():
+        after = sessions()
+        rebuild_rollups()
+        assert sessions() == after
+        assert [(p, a) for _, _, p, a in after] == [(1, 1), (1, 1), (1, 0)]
+
+def test_schema_sql_per_backend():
+    # the PostgreSQL objects, checked without a server; the suite itself runs
+    # against one with ATTENDEASE_DATABASE_URI=postgresql+psycopg://...
+    import postgres
+    from sqlalchemy.dialects import postgresql, sqlite
+    history = str(VIEWS['view_student_history'].compile(dialect=postgresql.dialect()))
+    assert 'JOIN "Enrollments" ON "Attendance"."EnrollmentID" = "Enrollments"."EnrollmentID"' in history
+    week = select(date_bucket('week', ClassSessions.Date))
+    assert "date_trunc('week', \"ClassSessions\".\"Date\")" in str(week.compile(dialect=postgresql.dialect()))
+    assert "'weekday 0', '-6 days'" in str(week.compile(dialect=sqlite.dialect()))
+    functions = {f.split('FUNCTION ')[1].split('(')[0] for f in postgres.FUNCTIONS}
+    assert {t[2].rsplit(' ', 1)[1].rstrip('()') for t in postgres.TRIGGERS} == functions
+
+def test_route_statement_budgets(client):
+    # a small run of benchmarks/bench_routes.py: every route within its SQL budget
+    from seed_data import generate_dataset
+    from bench_routes import run_suite
+    with app.app_context():
+        generate_dataset(students=40, classes=8, teachers=2, per_student=3, days=14,
+                         start=date(2025, 1, 6), seed=1, log=lambda msg: None)
+    run = run_suite(repeat=1, log=lambda msg: None)
+    assert [r['route'] for r in run['results'] if not r['ok']] == []
+
+def test_metrics_endpoint_reports_per_endpoint_histograms(client):
+    with app.app_context():
+        class_id = make_class(6)
+    request_metrics.reset()
+    login_as(client, 1, 'teacher')
+    client.get(f'/class/{class_id}/attendance/2025-01-06')
+    client.get('/dashboard')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'attendease_request_seconds_count{endpoint="dashboard"} 1' in body
+    assert 'attendease_db_statements_count{endpoint="take_attendance"} 1' in body
+    assert 'attendease_template_seconds_sum{endpoint="dashboard"}' in body
+    # the account check, the class and its roster: three statements,
+    # nothing repeated per student
+    assert 'attendease_db_statements_sum{endpoint="take_attendance"} 3.000000' in body
+    assert 'attendease_n_plus_one_total{endpoint="take_attendance"}' not in body
+    assert 'endpoint="metrics"' not in body
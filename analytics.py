@@ -0,0 +1,93 @@
+# analytics.py
+# Attendance analytics over the rollups. Rates come straight from the
+# AttendanceCounts totals, so the threshold filter is one pass over a narrow
+# table and never reads Attendance. Only the enrollments that pass it have
+# their AttendanceBits words loaded for the longest absence streak: each
+# enrollment's absent words arrive as one aggregated string, are joined into
+# one Python int aligned to its class's first session month, and the streak
+# is the longest run of 1s once that int is narrowed down to the days the
+# class met (from ClassSessions). The rest is big-int and string work done in C.
+from collections import namedtuple
+from operator import itemgetter
+from sqlalchemy import String, cast, func, select
+from app import db, AttendanceBits, AttendanceCounts, ClassSessions, Enrollments, month_index, day_bit
+
+WORD_BITS = 32      # bits per Month word; days 1..31 are bits 0..30
+
+EnrollmentStats = namedtuple('EnrollmentStats', [
+    'ClassID', 'StudentID', 'EnrollmentID', 'Sessions', 'Present', 'Rate', 'LongestAbsence'])
+
+def word_list(month, bits):
+    # 'month:bits month:bits ...' over a group, so a bitset is one column
+    # of one row rather than one row per month word
+    return func.aggregate_strings(cast(month, String) + ':' + cast(bits, String), ' ')
+
+def parse_words(words, base):
+    # -> the words of word_list() as one int, bit 0 = day 1 of month `base`
+    bits = 0
+    for word in (words or '').split():
+        month, value = word.split(':')
+        bits |= int(value) << (int(month) - base) * WORD_BITS
+    return bits
+
+def load_rates(class_ids=None, below=None, min_sessions=1):
+    # per-enrollment totals, and with `below` only the enrollments attending
+    # less than that (0..1); each row carries its absent words (see word_list)
+    absent = AttendanceBits.Held.bitwise_and(AttendanceBits.Present.bitwise_not())
+    absent_words = (select(word_list(AttendanceBits.Month, absent))
+                    .where(AttendanceBits.EnrollmentID==AttendanceCounts.EnrollmentID,
+                           AttendanceBits.Held != AttendanceBits.Present)
+                    .scalar_subquery().label('AbsentWords'))
+    qry = (select(Enrollments.ClassID, Enrollments.StudentID, AttendanceCounts.EnrollmentID,
+                  AttendanceCounts.TotalCount, AttendanceCounts.PresentCount, absent_words)
+           .join(Enrollments, AttendanceCounts.EnrollmentID==Enrollments.EnrollmentID)
+           .where(AttendanceCounts.TotalCount >= max(min_sessions, 1))
+           .order_by(Enrollments.ClassID, AttendanceCounts.EnrollmentID))
+    if below is not None:
+        qry = qry.where(AttendanceCounts.PresentCount < AttendanceCounts.TotalCount * below)
+    if class_ids is not None:
+        qry = qry.where(Enrollments.ClassID.in_(class_ids))
+    return db.session.execute(qry).all()
+
+def load_sessions(class_ids):
+    # -> {ClassID: (first month, bitset of the days it met)}; a month's word
+    # is the sum of its days' bits, as each day is one ClassSessions row
+    month = month_index(ClassSessions.Date)
+    words = (select(ClassSessions.ClassID, month.label('Month'),
+                    func.sum(day_bit(ClassSessions.Date)).label('Met'))
+             .where(ClassSessions.ClassID.in_(class_ids),
+                    ClassSessions.PresentCount + ClassSessions.AbsentCount > 0)
+             .group_by(ClassSessions.ClassID, month)
+             .subquery())
+    qry = (select(words.c.ClassID, func.min(words.c.Month), word_list(words.c.Month, words.c.Met))
+           .group_by(words.c.ClassID))
+    return {class_id: (base, parse_words(met, base))
+            for class_id, base, met in db.session.execute(qry)}
+
+def enrollment_stats(class_ids=None, below=None, min_sessions=1):
+    # -> [EnrollmentStats] for every enrollment with attendance (or only
+    # those attending less than `below`), class by class
+    rates = load_rates(class_ids, below, min_sessions)
+    sessions = load_sessions(sorted({r.ClassID for r in rates if r.AbsentWords})) if rates else {}
+    days = {}
+    stats = []
+    for class_id, sid, eid, total, present, absent_words in rates:
+        longest = 0
+        if absent_words:
+            base, met = sessions[class_id]
+            # the bit positions of the days the class met; a day the student
+            # has no record for is not an absence and ends a streak
+            if class_id not in days:
+                days[class_id] = (met.bit_length(),
+                                  itemgetter(*(i for i, bit in enumerate(f'{met:b}'[::-1]) if bit == '1')))
+            width, met_days = days[class_id]
+            absent = parse_words(absent_words, base)
+            longest = max(map(len, ''.join(met_days(f'{absent:0{width}b}'[::-1])).split('0')))
+        stats.append(EnrollmentStats(class_id, sid, eid, total, present, present / total, longest))
+    return stats
+
+def at_risk(threshold, class_ids=None, min_sessions=1):
+    # enrollments attending less than `threshold` (0..1) of their sessions,
+    # worst first
+    return sorted(enrollment_stats(class_ids, threshold, min_sessions),
+                  key=lambda s: (s.Rate, -s.LongestAbsence))
@@ -0,0 +1,240 @@
+# archive.py
+# Term archival. Closing a term moves its Attendance rows, and its share of
+# the rollups (AttendanceCounts, AttendanceSummary, AttendanceBits,
+# ClassSessions), out of the hot database into ARCHIVE_DIR/<term>.db, so the
+# hot tables and their indexes only hold open terms. ArchivedTerms lists
+# what has been moved; trg_attendance_archived_term rejects new rows dated
+# inside those terms. A term's row is committed before its rows are copied,
+# so nothing can be written to its dates between the copy and the release.
+#
+# Reports only touch the archive when asked for a date range that reaches
+# into an archived term: they read through history_connection(), a separate
+# read-only connection that ATTACHes just those term files (mode=ro) and
+# shadows view_student_history with a temp UNION ALL view over hot and cold
+# rows, so the same queries run against either.
+import os
+from contextlib import contextmanager
+from datetime import date, datetime
+from urllib.parse import quote
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.pool import NullPool
+from werkzeug.utils import secure_filename
+from app import app, db, response_cache, ArchivedTerms, month_sql, day_bit_sql, DB_BACKEND
+
+MAX_ATTACHED = 10       # SQLite's default SQLITE_MAX_ATTACHED
+
+COLD_SCHEMA = [
+    "CREATE TABLE cold.Term (Name TEXT, StartDate DATE, EndDate DATE)",
+    """CREATE TABLE cold.Attendance (
+        EnrollmentID INTEGER, ClassID INTEGER, StudentID INTEGER, Date DATE, Status VARCHAR(20),
+        PRIMARY KEY (EnrollmentID, Date))""",
+    "CREATE INDEX cold.ix_attendance_class_date ON Attendance (ClassID, Date)",
+    """CREATE TABLE cold.AttendanceSummary (
+        ClassID INTEGER, StudentID INTEGER,
+        PresentCount INTEGER, AbsentCount INTEGER, TotalCount INTEGER,
+        PRIMARY KEY (ClassID, StudentID))""",
+    """CREATE TABLE cold.ClassSessions (
+        ClassID INTEGER, Date DATE, PresentCount INTEGER, AbsentCount INTEGER,
+        PRIMARY KEY (ClassID, Date))""",
+]
+
+# copy the term into the attached file; ClassID/StudentID are kept on each
+# row so the file does not depend on Enrollments rows that may be dropped
+COPY_SQL = [
+    "INSERT INTO cold.Term VALUES (:name, :start, :end)",
+    """
+    INSERT INTO cold.Attendance
+    SELECT a.EnrollmentID, e.ClassID, e.StudentID, a.Date, a.Status
+    FROM main.Attendance a JOIN main.Enrollments e ON e.EnrollmentID=a.EnrollmentID
+    WHERE a.Date BETWEEN :start AND :end
+    ORDER BY a.EnrollmentID, a.Date
+    """,
+    """
+    INSERT INTO cold.AttendanceSummary
+    SELECT ClassID, StudentID, SUM(Status='present'), SUM(Status='absent'), COUNT(*)
+    FROM cold.Attendance GROUP BY ClassID, StudentID
+    """,
+    """
+    INSERT INTO cold.ClassSessions
+    SELECT ClassID, Date, PresentCount, AbsentCount
+    FROM main.ClassSessions WHERE Date BETWEEN :start AND :end
+    """,
+]
+
+# take the term's share back out of the hot rollups, then drop its rows with
+# the per-row triggers deferred, as bulk_upsert_attendance does
+RELEASE_SQL = [
+    """
+    INSERT INTO AttendanceCounts (EnrollmentID, PresentCount, AbsentCount, TotalCount)
+    SELECT EnrollmentID, -SUM(Status='present'), -SUM(Status='absent'), -COUNT(*)
+    FROM Attendance WHERE Date BETWEEN :start AND :end
+    GROUP BY EnrollmentID
+    ON CONFLICT(EnrollmentID) DO UPDATE SET
+      PresentCount = PresentCount + excluded.PresentCount,
+      AbsentCount  = AbsentCount  + excluded.AbsentCount,
+      TotalCount   = TotalCount   + excluded.TotalCount
+    """,
+    """
+    INSERT INTO AttendanceSummary (ClassID, StudentID, PresentCount, AbsentCount, TotalCount)
+    SELECT e.ClassID, e.StudentID,
+           -SUM(a.Status='present'), -SUM(a.Status='absent'), -COUNT(*)
+    FROM Attendance a JOIN Enrollments e ON e.EnrollmentID=a.EnrollmentID
+    WHERE a.Date BETWEEN :start AND :end
+    GROUP BY e.ClassID, e.StudentID
+    ON CONFLICT(ClassID, StudentID) DO UPDATE SET
+      PresentCount = PresentCount + excluded.PresentCount,
+      AbsentCount  = AbsentCount  + excluded.AbsentCount,
+      TotalCount   = TotalCount   + excluded.TotalCount
+    """,
+    f"""
+    UPDATE AttendanceBits
+    SET Held = Held & ~d.Bits, Present = Present & ~d.Bits
+    FROM (SELECT EnrollmentID, {month_sql('Date')} AS Month, SUM({day_bit_sql('Date')}) AS Bits
+          FROM Attendance WHERE Date BETWEEN :start AND :end
+          GROUP BY 1, 2) d
+    WHERE AttendanceBits.EnrollmentID = d.EnrollmentID AND AttendanceBits.Month = d.Month
+    """,
+    "DELETE FROM AttendanceCounts WHERE TotalCount = 0",
+    "DELETE FROM AttendanceSummary WHERE TotalCount = 0",
+    "DELETE FROM AttendanceBits WHERE Held = 0",
+    "DELETE FROM ClassSessions WHERE Date BETWEEN :start AND :end",
+    "INSERT INTO RollupDeferred VALUES (1)",
+    "DELETE FROM Attendance WHERE Date BETWEEN :start AND :end",
+    "DELETE FROM RollupDeferred",
+]
+
+def term_path(term):
+    return os.path.join(app.config['ARCHIVE_DIR'], term.FileName)
+
+def archive_term(name, start, end):
+    # -> the new ArchivedTerms row; raises ValueError if the term can't be closed
+    if DB_BACKEND != 'sqlite':
+        raise ValueError('terms are archived to SQLite files, so this needs the SQLite backend')
+    if start > end:
+        raise ValueError('the term starts after it ends')
+    if end >= date.today():
+        raise ValueError('only terms that have ended can be archived')
+    claimed = db.session.scalar(select(ArchivedTerms).where(ArchivedTerms.Name==name))
+    if claimed and os.path.exists(term_path(claimed)):
+        raise ValueError(f'term {name!r} is already archived')
+    if claimed:
+        # an attempt that died before its file was in place; its rows are
+        # all still hot, so start over
+        db.session.delete(claimed)
+        db.session.commit()
+    if overlapping_terms(start, end):
+        raise ValueError('the dates overlap an archived term')
+    file_name = secure_filename(f'{name}.db')
+    if not file_name or file_name == '.db':
+        raise ValueError(f'term name {name!r} does not make a usable file name')
+    os.makedirs(app.config['ARCHIVE_DIR'], exist_ok=True)
+    path = os.path.join(app.config['ARCHIVE_DIR'], file_name)
+    if db.session.scalar(select(ArchivedTerms.TermID).where(ArchivedTerms.FileName==file_name)):
+        raise ValueError(f'another archived term is already stored in {file_name}')
+    params = {'name': name, 'start': start.isoformat(), 'end': end.isoformat()}
+
+    # 1. claim the dates: once this row is committed, trg_attendance_archived_term
+    #    rejects new rows in the term, so what is copied below is all there is
+    #    and nothing written later can be released without a copy. Reports
+    #    keep reading the term from the hot tables until its file is in place.
+    term = ArchivedTerms(Name=name, StartDate=start, EndDate=end, FileName=file_name,
+                         Rows=0, ArchivedAt=datetime.now())
+    db.session.add(term)
+    db.session.commit()
+    try:
+        # 2. write the cold file beside its final name, so a crash here
+        #    never leaves a partial file where reports look for it
+        if os.path.exists(path + '.part'):
+            os.remove(path + '.part')
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS cold", (path + '.part',))
+            try:
+                for sql in COLD_SCHEMA:
+                    conn.exec_driver_sql(sql)
+                for sql in COPY_SQL:
+                    conn.execute(text(sql), params)
+                rows = conn.exec_driver_sql("SELECT COUNT(*) FROM cold.Attendance").scalar()
+                conn.commit()
+            finally:
+                conn.exec_driver_sql("DETACH DATABASE cold")
+        os.replace(path + '.part', path)
+
+        # 3. release the rows from the hot database in one transaction
+        term.Rows = rows
+        for sql in RELEASE_SQL:
+            db.session.execute(text(sql), params)
+        db.session.commit()
+    except BaseException:
+        # give the dates back; the hot rows are all still there
+        db.session.rollback()
+        db.session.delete(term)
+        db.session.commit()
+        for leftover in (path, path + '.part'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    response_cache.clear()
+    return term
+
+def readable_terms(start, end):
+    # the overlapping terms whose files are in place; a term still being
+    # archived is read from the hot tables (see archive_term)
+    return [t for t in overlapping_terms(start, end) if os.path.exists(term_path(t))]
+
+def overlapping_terms(start, end):
+    qry = select(ArchivedTerms).order_by(ArchivedTerms.StartDate)
+    if start:
+        qry = qry.where(ArchivedTerms.EndDate >= start)
+    if end:
+        qry = qry.where(ArchivedTerms.StartDate <= end)
+    return db.session.scalars(qry).all()
+
+_history_engine = None
+
+def history_engine():
+    # read-only URI connections on the hot file: ATTACH accepts mode=ro URIs
+    # and temp views, and nothing on it can write. NullPool, so attachments
+    # and temp views go away with the connection.
+    global _history_engine
+    if _history_engine is None:
+        hot = os.path.abspath(db.engine.url.database)
+        _history_engine = create_engine(f'sqlite:///file:{quote(hot)}?mode=ro&uri=true',
+                                        poolclass=NullPool)
+    return _history_engine
+
+def check_attachable(terms):
+    if len(terms) > MAX_ATTACHED:
+        raise ValueError(f'the range spans more than {MAX_ATTACHED} archived terms; narrow it')
+
+@contextmanager
+def history_connection(terms):
+    check_attachable(terms)
+    with history_engine().connect() as conn:
+        # hot rows of an attached term are skipped: between a term's file
+        # going into place and its release they are in both
+        hot = ' AND '.join(f"Date NOT BETWEEN '{t.StartDate.isoformat()}' AND '{t.EndDate.isoformat()}'"
+                           for t in terms)
+        parts = ["SELECT ClassID, StudentID, StudentName, ClassName, Date, Status "
+                 f"FROM main.view_student_history WHERE {hot}"]
+        for term in terms:
+            alias = f'term_{term.TermID}'
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {alias}",
+                                 (f'file:{quote(term_path(term))}?mode=ro',))
+            parts.append(f"""
+                SELECT a.ClassID, a.StudentID, u.Name, c.ClassName, a.Date, a.Status
+                FROM {alias}.Attendance a
+                JOIN main.Classes c ON c.ClassID=a.ClassID
+                JOIN main.Users u ON u.UserID=a.StudentID""")
+        conn.exec_driver_sql("CREATE TEMP VIEW view_student_history AS "
+                             + " UNION ALL ".join(parts))
+        yield conn
+
+def history_rows(qry, terms, chunk_rows):
+    # streams `qry` through history_connection; the connection lives as
+    # long as the returned generator, so this suits streamed CSV responses.
+    # Checked up front, so an error surfaces before the response starts.
+    check_attachable(terms)
+    def rows():
+        with history_connection(terms) as conn:
+            yield from conn.execution_options(yield_per=chunk_rows).execute(qry)
+    return rows()
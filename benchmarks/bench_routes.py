@@ -0,0 +1,194 @@
+# benchmarks/bench_routes.py
+# Times every main route through the Flask test client against a generated
+# dataset and checks each one against a SQL statement budget, so an N+1
+# regression fails the run. Results are written as JSON for comparing runs.
+#   python benchmarks/bench_routes.py --students 20000 --classes 1000 --days 120
+#   python benchmarks/bench_routes.py --reuse --compare benchmarks/results/<old>.json
+import os, sys, argparse, json, platform, sqlite3, statistics, subprocess, tempfile, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Statements allowed per request. None = not enforced yet (known N+1).
+# Each cache lookup costs one statement to read its versions, and each write
+# one more to bump them (see cache.SQLVersions).
+# Every signed-in request also costs one to check the account is still
+# active (see app.require_active_user).
+BUDGETS = {
+    'dashboard_teacher':        4,
+    'dashboard_student':        3,
+    'dashboard_admin':          1,
+    'take_attendance_get':      3,
+    'take_attendance_post':     5,
+    'report_summary':           5,
+    'report_summary_class':     4,
+    'report_summary_student':   4,
+    'report_summary_both':      4,
+    'report_summary_csv':       2,
+    'report_history_csv':       2,
+    'report_trend':             4,
+    'admin_users':              2,
+    'admin_users_role':         2,
+    'admin_users_search':       2,
+    'admin_users_deep':         2,
+}
+
+def routes(ctx):
+    # (name, role, method, url, form data)
+    cls, term = ctx['class_id'], ctx['student_term']
+    return [
+        ('dashboard_teacher',      'teacher', 'GET',  '/dashboard', None),
+        ('dashboard_student',      'student', 'GET',  '/dashboard', None),
+        ('dashboard_admin',        'admin',   'GET',  '/dashboard', None),
+        ('take_attendance_get',    'teacher', 'GET',  f'/class/{cls}/attendance/{ctx["date"]}', None),
+        ('take_attendance_post',   'teacher', 'POST', f'/class/{cls}/attendance/{ctx["date"]}',
+         {f'status_{eid}': 'present' for eid in ctx['enrollment_ids']}),
+        ('report_summary',         'admin',   'GET',  '/reports/summary', None),
+        ('report_summary_class',   'admin',   'GET',  f'/reports/summary?class_id={cls}', None),
+        ('report_summary_student', 'admin',   'GET',  f'/reports/summary?student_name={term}', None),
+        ('report_summary_both',    'admin',   'GET',  f'/reports/summary?class_id={cls}&student_name={term}', None),
+        ('report_summary_csv',     'admin',   'GET',  '/reports/summary?export=csv', None),
+        ('report_history_csv',     'admin',   'GET',  f'/reports/summary?export=history&class_id={cls}', None),
+        ('report_trend',           'admin',   'GET',  f'/reports/trend?start={ctx["date"][:4]}-01-01&bucket=week', None),
+        ('admin_users',            'admin',   'GET',  '/admin/users', None),
+        ('admin_users_role',       'admin',   'GET',  '/admin/users?role=student', None),
+        ('admin_users_search',     'admin',   'GET',  f'/admin/users?q={term}', None),
+        ('admin_users_deep',       'admin',   'GET',  f'/admin/users?after={ctx["deep_after"]}', None),
+    ]
+
+def bench_context():
+    # pick the largest class, its teacher and one of its students
+    from sqlalchemy import func
+    from app import db, User, Classes, Enrollments
+    class_id, _ = (db.session.query(Enrollments.ClassID, func.count())
+                   .group_by(Enrollments.ClassID)
+                   .order_by(func.count().desc()).first())
+    cls = db.session.get(Classes, class_id)
+    enrols = Enrollments.query.filter_by(ClassID=class_id).order_by(Enrollments.EnrollmentID).all()
+    student = db.session.get(User, enrols[0].StudentID)
+    admin = User.query.filter_by(Role_Type='admin').first()
+    max_id = db.session.query(func.max(User.UserID)).scalar()
+    return {
+        'class_id': class_id,
+        'roster': len(enrols),
+        'enrollment_ids': [e.EnrollmentID for e in enrols],
+        'teacher_id': cls.TeacherID,
+        'student_id': student.UserID,
+        'admin_id': admin.UserID,
+        'student_term': student.Name.split()[-1][:5],
+        'date': '2030-01-07',
+        'deep_after': max(0, max_id - 100),
+    }
+
+def run_suite(repeat=5, log=print):
+    from sqlalchemy import event
+    from app import app, db
+
+    with app.app_context():
+        ctx = bench_context()
+        engines = list(db.engines.values())
+    statements = []
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count)
+
+    clients = {}
+    for role in ('teacher', 'student', 'admin'):
+        client = clients[role] = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = ctx[f'{role}_id']
+            sess['role'] = role
+
+    results = []
+    try:
+        for name, role, method, url, data in routes(ctx):
+            timings, counts = [], []
+            for _ in range(repeat):
+                statements.clear()
+                start = time.perf_counter()
+                rv = clients[role].open(url, method=method, data=data)
+                rv.get_data()  # drain streamed responses
+                timings.append((time.perf_counter() - start) * 1000)
+                counts.append(len(statements))
+                if rv.status_code >= 400:
+                    raise RuntimeError(f'{name}: {method} {url} -> {rv.status_code}')
+            budget = BUDGETS.get(name)
+            result = {
+                'route': name, 'method': method, 'url': url,
+                'statements': max(counts), 'budget': budget,
+                'ok': budget is None or max(counts) <= budget,
+                'min_ms': round(min(timings), 3),
+                'median_ms': round(statistics.median(timings), 3),
+            }
+            results.append(result)
+            log(f"{name:<24} {result['statements']:>5} / {str(budget):<5} "
+                f"{result['median_ms']:>10.2f} ms {'' if result['ok'] else 'OVER BUDGET'}")
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', count)
+    return {'roster': ctx['roster'], 'results': results}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except OSError:
+        return None
+
+def compare(previous, current):
+    before = {r['route']: r for r in previous['results']}
+    print(f"\n{'route':<24} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    for r in current['results']:
+        old = before.get(r['route'])
+        if old:
+            change = (r['median_ms'] - old['median_ms']) / old['median_ms'] * 100 if old['median_ms'] else 0
+            print(f"{r['route']:<24} {old['median_ms']:>10.2f} {r['median_ms']:>10.2f} {change:>7.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--classes',  type=int, default=250)
+    parser.add_argument('--days',     type=int, default=90)
+    parser.add_argument('--seed',     type=int, default=1)
+    parser.add_argument('--repeat',   type=int, default=5)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'attendease-bench.db'))
+    parser.add_argument('--reuse', action='store_true', help='skip generation if --db exists')
+    parser.add_argument('--output', default=None, help='JSON results path')
+    parser.add_argument('--compare', default=None, help='previous JSON results to diff against')
+    args = parser.parse_args()
+
+    os.environ['ATTENDEASE_DATABASE_URI'] = 'sqlite:///' + os.path.abspath(args.db)
+    from datetime import date
+    from app import app
+    from seed_data import generate_dataset
+
+    dataset = {'students': args.students, 'classes': args.classes, 'days': args.days, 'seed': args.seed}
+    if not (args.reuse and os.path.exists(args.db)):
+        with app.app_context():
+            generate_dataset(students=args.students, classes=args.classes,
+                             teachers=max(1, args.classes // 4), days=args.days,
+                             start=date(2025, 1, 6), seed=args.seed)
+
+    run = run_suite(repeat=args.repeat)
+    run['meta'] = {
+        'dataset': dataset,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+    }
+    output = args.output or os.path.join(os.path.dirname(__file__), 'results',
+                                         time.strftime('bench-%Y%m%d-%H%M%S.json'))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as fh:
+        json.dump(run, fh, indent=2)
+    print(f'\nwrote {output}')
+    if args.compare:
+        with open(args.compare) as fh:
+            compare(json.load(fh), run)
+    over = [r['route'] for r in run['results'] if not r['ok']]
+    if over:
+        print('over statement budget: ' + ', '.join(over))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
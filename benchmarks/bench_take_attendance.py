@@ -0,0 +1,57 @@
+# benchmarks/bench_take_attendance.py
+# Query count and latency of take_attendance POST as the roster grows.
+#   python benchmarks/bench_take_attendance.py [roster sizes...]
+import os, sys, tempfile, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('ATTENDEASE_DATABASE_URI',
+                      'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from datetime import date
+from sqlalchemy import event
+from app import app, db, User, Teacher, Student, Classes, Enrollments
+
+statements = []
+
+def seed(roster_size):
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(UserID=1, Username='t1', Password='x', Name='T', Role_Type='teacher'))
+    db.session.add(Teacher(UserID=1, HireDate=date.today()))
+    db.session.add(Classes(ClassID=1, ClassName='CSC 1001', TeacherID=1))
+    db.session.flush()
+    db.session.execute(User.__table__.insert(), [
+        {'UserID': 100 + i, 'Username': f's{i}', 'Password': 'x',
+         'Name': f'Student {i}', 'Role_Type': 'student'} for i in range(roster_size)])
+    db.session.execute(Student.__table__.insert(), [
+        {'UserID': 100 + i, 'EnrollmentDate': date.today()} for i in range(roster_size)])
+    db.session.execute(Enrollments.__table__.insert(), [
+        {'StudentID': 100 + i, 'ClassID': 1, 'Status': 'active'} for i in range(roster_size)])
+    db.session.commit()
+    return [eid for (eid,) in db.session.query(Enrollments.EnrollmentID)]
+
+def run(roster_size, repeat=5):
+    with app.app_context():
+        eids = seed(roster_size)
+    form = {f'status_{eid}': 'present' if eid % 3 else 'absent' for eid in eids}
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['role'] = 'teacher'
+    timings = []
+    for i in range(repeat):
+        statements.clear()
+        start = time.perf_counter()
+        rv = client.post(f'/class/1/attendance/2025-01-{i + 1:02d}', data=form)
+        timings.append(time.perf_counter() - start)
+        assert rv.status_code == 302, rv.status_code
+    return len(statements), min(timings) * 1000
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10, 100, 1000, 5000]
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *args: statements.append(args[2]))
+    print(f"{'roster':>8} {'queries':>8} {'POST ms':>10}")
+    for n in sizes:
+        queries, ms = run(n)
+        print(f"{n:>8} {queries:>8} {ms:>10.2f}")
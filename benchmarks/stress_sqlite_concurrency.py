@@ -0,0 +1,97 @@
+# benchmarks/stress_sqlite_concurrency.py
+# Concurrent take_attendance POSTs against report_summary GETs, run once with
+# the SQLite engine profile disabled and once enabled. Each client is a
+# thread inside one of several worker processes, like threaded WSGI workers,
+# so SQLite sees real cross-process lock contention.
+#   python benchmarks/stress_sqlite_concurrency.py [writers] [readers] [seconds]
+import os, sys, json, multiprocessing, subprocess, tempfile, threading, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+def worker_main(writers, readers, seconds):
+    from datetime import date, timedelta
+    from app import app, db, create_schema, User, Teacher, Student, Classes, Enrollments
+
+    roster = 200
+    with app.app_context():
+        create_schema()
+        for t in range(writers):
+            tid = 1 + t
+            db.session.add(User(UserID=tid, Username=f't{t}', Password='x', Name=f'T {t}', Role_Type='teacher'))
+            db.session.add(Teacher(UserID=tid, HireDate=date.today()))
+            db.session.add(Classes(ClassID=tid, ClassName=f'CLS {t}', TeacherID=tid))
+        db.session.flush()
+        base = 1000
+        db.session.execute(User.__table__.insert(), [
+            {'UserID': base + i, 'Username': f's{i}', 'Password': 'x',
+             'Name': f'Student {i}', 'Role_Type': 'student'} for i in range(roster)])
+        db.session.execute(Student.__table__.insert(), [
+            {'UserID': base + i, 'EnrollmentDate': date.today()} for i in range(roster)])
+        db.session.execute(Enrollments.__table__.insert(), [
+            {'StudentID': base + i, 'ClassID': 1 + t, 'Status': 'active'}
+            for t in range(writers) for i in range(roster)])
+        db.session.commit()
+        # forked workers must not inherit pooled connections
+        for engine in db.engines.values():
+            engine.dispose()
+
+    stop = time.monotonic() + seconds
+    procs = max(1, min(4, writers + readers))
+    with multiprocessing.get_context('fork').Pool(procs) as pool:
+        results = pool.starmap(run_clients, [
+            (writers, list(range(writers))[p::procs], readers // procs + (p < readers % procs), stop)
+            for p in range(procs)])
+    stats = {k: sum(r[k] for r in results) for k in results[0]}
+    print(json.dumps({k: v / seconds if k != 'errors' else v for k, v in stats.items()}))
+
+def run_clients(writers, writer_ids, readers, stop):
+    from datetime import date, timedelta
+    from app import app, db
+    app.logger.disabled = True
+    stats = {'writes': 0, 'reads': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def client_for(user_id, role):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+            sess['role'] = role
+        return client
+
+    def writer(t):
+        client = client_for(1 + t, 'teacher')
+        day = date(2025, 1, 1)
+        while time.monotonic() < stop:
+            rv = client.post(f'/class/{1 + t}/attendance/{day}', data={})
+            with lock:
+                stats['writes' if rv.status_code == 302 else 'errors'] += 1
+            day += timedelta(days=1)
+
+    def reader():
+        client = client_for(1, 'admin')
+        while time.monotonic() < stop:
+            rv = client.get('/reports/summary')
+            with lock:
+                stats['reads' if rv.status_code == 200 else 'errors'] += 1
+
+    threads = ([threading.Thread(target=writer, args=(t,)) for t in writer_ids]
+               + [threading.Thread(target=reader) for _ in range(readers)])
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    return stats
+
+if __name__ == '__main__':
+    if os.environ.get('STRESS_WORKER'):
+        worker_main(*(int(a) for a in sys.argv[1:4]))
+        sys.exit()
+    args = sys.argv[1:] or ['8', '4', '5']
+    print(f"{'profile':>8} {'writes/s':>10} {'reads/s':>10} {'errors':>8}")
+    for tuned in ('false', 'true'):
+        env = dict(os.environ, STRESS_WORKER='1', ATTENDEASE_SQLITE_TUNING=tuned,
+                   ATTENDEASE_DATABASE_URI='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'stress.db'))
+        out = subprocess.run([sys.executable, __file__, *args], env=env,
+                             capture_output=True, text=True, check=True).stdout
+        res = json.loads(out.strip().splitlines()[-1])
+        print(f"{'on' if tuned == 'true' else 'off':>8} {res['writes']:>10.1f} "
+              f"{res['reads']:>10.1f} {res['errors']:>8}")
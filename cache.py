@@ -0,0 +1,161 @@
+# cache.py
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from sqlalchemy import bindparam, text
+
+
+class MemoryBackend:
+    # In-process LRU for payloads. Versions live in their own dict, outside the
+    # LRU, so evicting an entry can never roll a version back to a stale key.
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries    = OrderedDict()
+        # the epoch starts from the clock, so version tags from an earlier run
+        # of the process (e.g. in cached export file names) are never reused
+        self._versions   = Counter({'epoch': time.time_ns()})
+        self._lock       = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, names):
+        with self._lock:
+            return [self._versions[name] for name in names]
+
+    def bump(self, names):
+        with self._lock:
+            for name in names:
+                self._versions[name] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    # Shared backend, so every worker process sees the same versions.
+    # Payloads expire after `ttl` seconds; versions never expire.
+    def __init__(self, url, ttl=3600, prefix='attendease:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_URL is a Redis URL but the redis package is not installed')
+        self._redis = redis.Redis.from_url(url)
+        self.ttl    = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self._redis.get(self.prefix + 'p:' + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value):
+        self._redis.set(self.prefix + 'p:' + key, pickle.dumps(value), ex=self.ttl)
+
+    def versions(self, names):
+        return [int(v or 0) for v in self._redis.mget([self.prefix + 'v:' + n for n in names])]
+
+    def bump(self, names):
+        pipe = self._redis.pipeline(transaction=False)
+        for name in names:
+            pipe.incr(self.prefix + 'v:' + name)
+        pipe.execute()
+
+    def clear(self):
+        pass    # the epoch bump in ResponseCache.clear() already orphans every key
+
+
+class SQLVersions:
+    # Versions in a table of the application database, so every process that
+    # writes to it -- web workers, CLI commands, job workers -- bumps the
+    # versions every other process reads; one SELECT per lookup. `engine` is
+    # a callable returning the SQLAlchemy engine, called on each use.
+    def __init__(self, engine, table='CacheVersions'):
+        self._engine = engine
+        self._select = text(f'SELECT "Name", "Version" FROM "{table}" WHERE "Name" IN :names'
+                            ).bindparams(bindparam('names', expanding=True))
+        self._bump   = text(f'INSERT INTO "{table}" ("Name", "Version") VALUES (:name, 1) '
+                            f'ON CONFLICT ("Name") DO UPDATE SET "Version" = "{table}"."Version" + 1')
+
+    def versions(self, names):
+        with self._engine().connect() as conn:
+            found = dict(conn.execute(self._select, {'names': list(set(names))}).all())
+        return [found.get(name, 0) for name in names]
+
+    def bump(self, names):
+        # sorted, so concurrent bumps take the row locks in the same order
+        with self._engine().begin() as conn:
+            conn.execute(self._bump, [{'name': name} for name in sorted(set(names))])
+
+
+class ResponseCache:
+    # Caches computed payloads under the current versions of the data they
+    # were built from, e.g. ['class:3'] or ['student:42']. Writers bump the
+    # versions they touch *after* committing; the next read then builds a new
+    # key, so a stale payload is never served and just ages out of the backend.
+    # A bump that lands while a payload is being computed only costs one miss.
+    # Versions are kept by `versions` (e.g. SQLVersions) when given, else by
+    # the backend, which for MemoryBackend only this process can see.
+    def __init__(self, backend=None, enabled=True, versions=None):
+        self.backend  = backend if backend is not None else MemoryBackend()
+        self.versions = versions if versions is not None else self.backend
+        self.enabled  = enabled
+        self._lock   = threading.Lock()
+        self._stats  = defaultdict(Counter)
+
+    def get_or_compute(self, name, params, depends, compute):
+        if not self.enabled:
+            return compute()
+        key = f'{name}|{params!r}|{self.version_tag(depends)}'
+        value = self.backend.get(key)
+        with self._lock:
+            self._stats[name]['hits' if value is not None else 'misses'] += 1
+        if value is None:
+            value = compute()
+            self.backend.set(key, value)
+        return value
+
+    def version_tag(self, depends):
+        # 'epoch=..,class:3=..': changes whenever any of `depends` is bumped
+        depends = ['epoch', *depends]
+        return ','.join(f'{d}={v}' for d, v in zip(depends, self.versions.versions(depends)))
+
+    def bump(self, *names):
+        # even when disabled: export job keys are built from version_tag()
+        if names:
+            self.versions.bump(names)
+
+    def clear(self):
+        # invalidate everything, e.g. after a bulk load that bypassed the routes
+        self.versions.bump(['epoch'])
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._stats.items()}
+
+    def render(self, prefix='attendease'):
+        lines = []
+        with self._lock:
+            for kind in ('hits', 'misses'):
+                lines.append(f'# HELP {prefix}_cache_{kind}_total Response cache {kind}')
+                lines.append(f'# TYPE {prefix}_cache_{kind}_total counter')
+                for name, counts in sorted(self._stats.items()):
+                    lines.append(f'{prefix}_cache_{kind}_total{{cache="{name}"}} {counts[kind]}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,84 @@
+# hashing.py
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when no hashing slot frees up within the configured timeout."""
+
+
+class PasswordHasher:
+    # Runs werkzeug's password hashing in a bounded process pool so a burst of
+    # logins is limited by CPU cores, not by how many web threads are waiting.
+    # `method` is any werkzeug method string, e.g. 'scrypt' or
+    # 'pbkdf2:sha256:600000'. workers=0 hashes inline on the calling thread.
+    def __init__(self, method='scrypt', workers=None, max_pending=64, timeout=10):
+        self.method      = method
+        self.workers     = workers
+        self.timeout     = timeout
+        self._slots      = threading.BoundedSemaphore(max_pending)
+        self._lock       = threading.Lock()
+        self._pool       = None
+        self._params     = None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        # Bulk hashing for roster imports. Submitted one slice of a password
+        # per worker at a time, so a login queued meanwhile waits at most one
+        # slice instead of the whole batch.
+        if self.workers == 0:
+            return [generate_password_hash(p, self.method) for p in passwords]
+        pool = self._executor()
+        step = self.workers or os.cpu_count() or 1
+        hashes = []
+        for i in range(0, len(passwords), step):
+            futures = [pool.submit(generate_password_hash, p, self.method)
+                       for p in passwords[i:i + step]]
+            hashes.extend(f.result() for f in futures)
+        return hashes
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        # True when a stored hash was made with other parameters than ours
+        return pwhash.split('$', 1)[0] != self.params
+
+    @property
+    def params(self):
+        # the fully expanded method prefix, e.g. 'scrypt:32768:8:1'
+        if self._params is None:
+            self._params = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._params
+
+    def _run(self, fn, *args):
+        if self.workers == 0:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HasherBusy('password hashing queue is full')
+        try:
+            return self._executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: never fork a process that holds DB connections and threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'))
+                atexit.register(self.shutdown)
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,181 @@
+# ingest.py
+# Bulk attendance import for badge scanners and LMS exports. Records are
+#   {"username": "11001", "class": "CSC 1001" or 7, "date": "2025-01-06", "status": "present"}
+# read from a JSON array, NDJSON or CSV stream. Names are resolved through
+# in-memory maps loaded once per import, rows are checked against the same
+# rules as trg_validate_attendance_status, and valid rows go through
+# bulk_upsert_attendance chunk_rows at a time, one transaction per chunk.
+import csv
+import json
+import os
+import time
+from datetime import date
+from sqlalchemy import select
+from app import db, response_cache, bulk_upsert_attendance, User, Classes, Enrollments, ArchivedTerms
+
+STATUSES   = ('present', 'absent')   # what trg_validate_attendance_status accepts
+CHUNK_ROWS = 50_000
+MAX_ERRORS = 1000                    # errors listed in the report; all are counted
+PARSE_LINES = 5000                   # NDJSON lines decoded per json.loads call
+
+def load_classes():
+    # -> ({ClassID: TeacherID}, {ClassName: ClassID}); a name used by two
+    # classes maps to None, so it has to be given by ClassID instead
+    teachers, class_ids = {}, {}
+    for class_id, name, teacher in db.session.execute(
+            select(Classes.ClassID, Classes.ClassName, Classes.TeacherID)):
+        teachers[class_id] = teacher
+        class_ids[name] = None if name in class_ids else class_id
+    return teachers, class_ids
+
+def resolve_class(cls, teachers, class_ids):
+    # a ClassID (int or digit string) or a ClassName -> ClassID, else None
+    if isinstance(cls, int) or str(cls).strip().isdigit():
+        return int(cls) if int(cls) in teachers else None
+    return class_ids.get(str(cls or '').strip())
+
+def guess_format(filename):
+    ext = os.path.splitext(filename or '')[1].lower()
+    return {'.json': 'json', '.csv': 'csv'}.get(ext, 'ndjson')
+
+def read_records(stream, fmt='ndjson'):
+    # yields (line or index, record); a record that cannot be parsed is
+    # yielded as an error string so it is reported, not fatal
+    if fmt == 'json':
+        data = json.load(stream)
+        if isinstance(data, dict):
+            data = data.get('records')
+        if not isinstance(data, list):
+            raise ValueError('expected a JSON array of records or {"records": [...]}')
+        yield from enumerate(data, 1)
+    elif fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        batch = []
+        for n, line in enumerate(stream, 1):
+            if line.strip():
+                batch.append((n, line))
+            if len(batch) == PARSE_LINES:
+                yield from _decode_lines(batch)
+                batch = []
+        yield from _decode_lines(batch)
+
+def _decode_lines(batch):
+    # one json.loads over a batch of lines joined into an array is several
+    # times faster than one call per line; a batch that fails (or splits
+    # into a different number of values) is redone line by line so each
+    # error is reported against its own line
+    try:
+        records = json.loads('[' + ','.join(line for _, line in batch) + ']')
+    except ValueError:
+        records = None
+    if records is not None and len(records) == len(batch):
+        yield from zip((n for n, _ in batch), records)
+        return
+    for n, line in batch:
+        try:
+            yield n, json.loads(line)
+        except ValueError as e:
+            yield n, f'invalid JSON: {e}'
+
+class AttendanceImport:
+    def __init__(self, teacher_id=None, chunk_rows=CHUNK_ROWS, max_errors=MAX_ERRORS):
+        # teacher_id limits the import to that teacher's classes
+        self.teacher_id = teacher_id
+        self.chunk_rows = chunk_rows
+        self.max_errors = max_errors
+        self.students = dict(db.session.execute(
+            select(User.Username, User.UserID).where(User.Role_Type=='student')).all())
+        self.teachers, self.class_ids = load_classes()
+        self.enrollments = {(sid, cid): eid for eid, sid, cid in db.session.execute(
+            select(Enrollments.EnrollmentID, Enrollments.StudentID, Enrollments.ClassID))}
+        self.dates  = {}    # raw date string -> ISO date, or None if invalid
+        # archived terms are read-only (trg_attendance_archived_term would
+        # abort the whole chunk), so their dates are rejected per record
+        self.terms  = [(s.isoformat(), e.isoformat(), name) for s, e, name in db.session.execute(
+            select(ArchivedTerms.StartDate, ArchivedTerms.EndDate, ArchivedTerms.Name))]
+        self.closed = {}    # ISO date -> archived term name, or None
+        self.report = {'received': 0, 'imported': 0, 'failed': 0, 'errors': []}
+
+    def resolve(self, rec):
+        # -> (row, StudentID, ClassID) or an error message
+        if not isinstance(rec, dict):
+            return 'record is not an object'
+        student_id = self.students.get(str(rec.get('username') or '').strip())
+        if student_id is None:
+            return f'unknown student {rec.get("username")!r}'
+        cls = rec.get('class', rec.get('class_id'))
+        class_id = resolve_class(cls, self.teachers, self.class_ids)
+        if class_id is None:
+            return f'unknown or ambiguous class {cls!r}'
+        if self.teacher_id is not None and self.teachers[class_id] != self.teacher_id:
+            return f'class {cls!r} is not yours'
+        status = str(rec.get('status') or '').strip().lower()
+        if status not in STATUSES:
+            return 'Invalid attendance status'
+        day = self.parse_date(rec.get('date'))
+        if day is None:
+            return f'invalid date {rec.get("date")!r}'
+        if day not in self.closed:
+            self.closed[day] = next((name for s, e, name in self.terms if s <= day <= e), None)
+        if self.closed[day]:
+            return f'{day} is in archived term {self.closed[day]!r}'
+        eid = self.enrollments.get((student_id, class_id))
+        if eid is None:
+            return 'student is not enrolled in this class'
+        return (eid, day, status), student_id, class_id
+
+    def parse_date(self, raw):
+        # a batch spans few distinct dates, so each is parsed once
+        if not isinstance(raw, str):
+            return None
+        if raw not in self.dates:
+            try:
+                self.dates[raw] = date.fromisoformat(raw.strip()).isoformat()
+            except ValueError:
+                self.dates[raw] = None
+        return self.dates[raw]
+
+    def fail(self, line, message):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < self.max_errors:
+            self.report['errors'].append({'line': line, 'error': message})
+
+    def run(self, records):
+        began = time.perf_counter()
+        chunk, students, classes = [], set(), set()
+        for line, rec in records:
+            self.report['received'] += 1
+            result = rec if isinstance(rec, str) else self.resolve(rec)
+            if isinstance(result, str):
+                self.fail(line, result)
+                continue
+            row, student_id, class_id = result
+            chunk.append(row)
+            students.add(student_id)
+            classes.add(class_id)
+            if len(chunk) >= self.chunk_rows:
+                self.flush(chunk, students, classes)
+                chunk, students, classes = [], set(), set()
+        self.flush(chunk, students, classes)
+        seconds = time.perf_counter() - began
+        self.report['seconds'] = round(seconds, 3)
+        self.report['per_second'] = round(self.report['received'] / seconds) if seconds else None
+        return self.report
+
+    def flush(self, chunk, students, classes):
+        if not chunk:
+            return
+        # key order keeps the inserts appending to the (EnrollmentID, Date)
+        # index; the sort is stable, so a repeated key still ends last-wins
+        chunk.sort(key=lambda r: (r[0], r[1]))
+        bulk_upsert_attendance(chunk)
+        db.session.commit()
+        self.report['imported'] += len(chunk)
+        # shared versions (CacheVersions or Redis), so an import run from the
+        # CLI or cron invalidates the web workers' payloads too
+        response_cache.bump('report', *(f'class:{c}' for c in classes),
+                            *(f'teacher:{self.teachers[c]}' for c in classes),
+                            *(f'student:{s}' for s in students))
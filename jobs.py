@@ -0,0 +1,62 @@
+# jobs.py
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+class JobRunner:
+    # Runs report/export jobs in a spawn-context process pool, away from the
+    # web workers. Job state lives in the Jobs table, so any web process can
+    # answer a status poll; the pool only receives job ids. Finished files
+    # are kept in `directory` for `ttl` seconds, named by the job's cache key.
+    # workers=0 runs each job inline on the submitting thread.
+    def __init__(self, directory, workers=2, ttl=86400):
+        self.directory = directory
+        self.workers   = workers
+        self.ttl       = ttl
+        self._lock     = threading.Lock()
+        self._pool     = None
+
+    def path(self, cache_key):
+        return os.path.join(self.directory, f'{cache_key}.csv')
+
+    def submit(self, job_id):
+        self.prune()
+        if self.workers == 0:
+            _execute(job_id)
+        else:
+            self._executor().submit(_execute, job_id)
+
+    def prune(self):
+        # drop result files past their ttl; their jobs then report "expired"
+        cutoff = time.time() - self.ttl
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: the child imports the app afresh instead of inheriting
+                # this process's DB connections and threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'))
+                atexit.register(self.shutdown)
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def _execute(job_id):
+    from app import app, run_job
+    with app.app_context():
+        run_job(job_id)
@@ -0,0 +1,164 @@
+# metrics.py
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+
+slow_log = logging.getLogger('attendease.slow')
+
+TIME_BUCKETS  = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts  = [0] * len(buckets)
+        self.total   = 0
+        self.sum     = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum   += value
+
+
+class RequestMetrics:
+    # Per-request SQL and latency accounting, aggregated per Flask endpoint
+    # and served in Prometheus text format.
+    #   statements / DB time   <- engine before/after_cursor_execute
+    #   template render time   <- before_render_template / template_rendered
+    #   total latency          <- before_request ... teardown_request, so a
+    #                             streamed response is timed until its last chunk
+    # A statement repeated n_plus_one_threshold times in one request counts as
+    # an N+1. Requests slower than slow_request_ms (None = off) are logged.
+    def __init__(self, app=None, engines=(), slow_request_ms=None,
+                 n_plus_one_threshold=5, top_statements=3):
+        self.slow_request_ms      = slow_request_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.top_statements       = top_statements
+        self._lock       = threading.Lock()
+        self._histograms = {}
+        self._counters   = defaultdict(Counter)
+        if app is not None:
+            self.init_app(app, engines)
+
+    def init_app(self, app, engines):
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor)
+            event.listen(engine, 'handle_error', self._cursor_failed)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+
+    # hooks
+    def _start_request(self):
+        g._metrics = {'start': time.perf_counter(), 'statements': [],
+                      'db_time': 0.0, 'render_time': 0.0, 'render_start': None}
+
+    def _current(self):
+        return g.get('_metrics') if has_request_context() else None
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_start', []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['_metrics_start'].pop()
+        current = self._current()
+        if current is not None:
+            current['statements'].append((elapsed, statement))
+            current['db_time'] += elapsed
+
+    def _cursor_failed(self, context):
+        if context.connection is not None and context.connection.info.get('_metrics_start'):
+            context.connection.info['_metrics_start'].pop()
+
+    def _before_render(self, sender, template, context, **extra):
+        current = self._current()
+        if current is not None:
+            current['render_start'] = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        current = self._current()
+        if current is not None and current['render_start'] is not None:
+            current['render_time'] += time.perf_counter() - current['render_start']
+            current['render_start'] = None
+
+    def _finish_request(self, exc):
+        current = g.pop('_metrics', None)
+        if current is None or request.endpoint == 'metrics':
+            return
+        endpoint   = request.endpoint or 'unmatched'
+        latency    = time.perf_counter() - current['start']
+        statements = current['statements']
+        repeated   = [sql for sql, n in Counter(sql for _, sql in statements).items()
+                      if n >= self.n_plus_one_threshold]
+        with self._lock:
+            self._observe('request_seconds', endpoint, latency, TIME_BUCKETS)
+            self._observe('db_seconds', endpoint, current['db_time'], TIME_BUCKETS)
+            self._observe('db_statements', endpoint, len(statements), COUNT_BUCKETS)
+            self._observe('template_seconds', endpoint, current['render_time'], TIME_BUCKETS)
+            self._counters['requests_total'][endpoint] += 1
+            if exc is not None:
+                self._counters['request_errors_total'][endpoint] += 1
+            if repeated:
+                self._counters['n_plus_one_total'][endpoint] += 1
+        if self.slow_request_ms is not None and latency * 1000 >= self.slow_request_ms:
+            slowest = sorted(statements, key=lambda s: s[0], reverse=True)[:self.top_statements]
+            slow_log.warning(
+                'slow request %s %s %.1f ms: %d statements, %.1f ms db, %.1f ms render%s; slowest: %s',
+                endpoint, request.path, latency * 1000, len(statements),
+                current['db_time'] * 1000, current['render_time'] * 1000,
+                f', N+1 suspects: {len(repeated)}' if repeated else '',
+                ' | '.join(f'{t * 1000:.1f} ms {" ".join(sql.split())[:200]}' for t, sql in slowest))
+
+    def _observe(self, name, endpoint, value, buckets):
+        hist = self._histograms.setdefault((name, endpoint), Histogram(buckets))
+        hist.observe(value)
+
+    # exposition
+    HELP = {
+        'request_seconds':      'Request latency including streamed bodies',
+        'db_seconds':           'Time spent executing SQL per request',
+        'db_statements':        'SQL statements executed per request',
+        'template_seconds':     'Template render time per request',
+        'requests_total':       'Requests handled',
+        'request_errors_total': 'Requests that raised an exception',
+        'n_plus_one_total':     'Requests that repeated one statement past the N+1 threshold',
+    }
+
+    def render(self, prefix='attendease'):
+        lines = []
+        with self._lock:
+            by_name = defaultdict(list)
+            for (name, endpoint), hist in sorted(self._histograms.items()):
+                by_name[name].append((endpoint, hist))
+            for name, series in by_name.items():
+                lines.append(f'# HELP {prefix}_{name} {self.HELP[name]}')
+                lines.append(f'# TYPE {prefix}_{name} histogram')
+                for endpoint, hist in series:
+                    cumulative = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        cumulative += n
+                        lines.append(f'{prefix}_{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{prefix}_{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {hist.total}')
+                    lines.append(f'{prefix}_{name}_sum{{endpoint="{endpoint}"}} {hist.sum:.6f}')
+                    lines.append(f'{prefix}_{name}_count{{endpoint="{endpoint}"}} {hist.total}')
+            for name, counts in sorted(self._counters.items()):
+                lines.append(f'# HELP {prefix}_{name} {self.HELP[name]}')
+                lines.append(f'# TYPE {prefix}_{name} counter')
+                for endpoint, n in sorted(counts.items()):
+                    lines.append(f'{prefix}_{name}{{endpoint="{endpoint}"}} {n}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
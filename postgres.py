@@ -0,0 +1,251 @@
+# postgres.py
+# The PostgreSQL side of the schema objects and bulk paths that app.py
+# writes as SQLite SQL: create_schema() and bulk_upsert_attendance() call in
+# here when DATABASE_URI is a postgresql:// URL. Tables, indexes and views
+# come from the models for either backend; what lives here is
+#   - the rollup triggers, as statement-level plpgsql triggers that apply a
+#     whole statement's rows at once through its transition tables,
+#   - pg_trgm indexes in place of the FTS5 users_fts table, and
+#   - the bulk import, staged with COPY instead of executemany.
+# The table and column names are mixed case, so every one is quoted.
+import csv
+from io import StringIO
+from app import db, month_sql, day_bit_sql
+
+MONTH = month_sql('"Date"', 'postgresql')
+BIT   = day_bit_sql('"Date"', 'postgresql')
+
+def _upsert_counts(rows):
+    # rows: a query of ("EnrollmentID", "Date", "Status", w) with w = +1/-1
+    sums = """SUM(CASE WHEN d."Status" = 'present' THEN d.w ELSE 0 END),
+           SUM(CASE WHEN d."Status" = 'absent'  THEN d.w ELSE 0 END)"""
+    return f"""
+    INSERT INTO "AttendanceCounts" ("EnrollmentID", "PresentCount", "AbsentCount", "TotalCount")
+    SELECT d."EnrollmentID", {sums}, SUM(d.w)
+    FROM ({rows}) d
+    GROUP BY d."EnrollmentID"
+    ON CONFLICT ("EnrollmentID") DO UPDATE SET
+      "PresentCount" = "AttendanceCounts"."PresentCount" + excluded."PresentCount",
+      "AbsentCount"  = "AttendanceCounts"."AbsentCount"  + excluded."AbsentCount",
+      "TotalCount"   = "AttendanceCounts"."TotalCount"   + excluded."TotalCount";
+    INSERT INTO "AttendanceSummary" ("ClassID", "StudentID", "PresentCount", "AbsentCount", "TotalCount")
+    SELECT e."ClassID", e."StudentID", {sums}, SUM(d.w)
+    FROM ({rows}) d JOIN "Enrollments" e ON e."EnrollmentID" = d."EnrollmentID"
+    GROUP BY e."ClassID", e."StudentID"
+    ON CONFLICT ("ClassID", "StudentID") DO UPDATE SET
+      "PresentCount" = "AttendanceSummary"."PresentCount" + excluded."PresentCount",
+      "AbsentCount"  = "AttendanceSummary"."AbsentCount"  + excluded."AbsentCount",
+      "TotalCount"   = "AttendanceSummary"."TotalCount"   + excluded."TotalCount";
+    INSERT INTO "ClassSessions" ("ClassID", "Date", "PresentCount", "AbsentCount")
+    SELECT e."ClassID", d."Date", {sums}
+    FROM ({rows}) d JOIN "Enrollments" e ON e."EnrollmentID" = d."EnrollmentID"
+    GROUP BY e."ClassID", d."Date"
+    ON CONFLICT ("ClassID", "Date") DO UPDATE SET
+      "PresentCount" = "ClassSessions"."PresentCount" + excluded."PresentCount",
+      "AbsentCount"  = "ClassSessions"."AbsentCount"  + excluded."AbsentCount";"""
+
+def _rows(source, weight):
+    return f'SELECT "EnrollmentID", "Date", "Status", {weight} AS w FROM {source}'
+
+def _bits_set(source):
+    return f"""
+    INSERT INTO "AttendanceBits" ("EnrollmentID", "Month", "Held", "Present")
+    SELECT "EnrollmentID", {MONTH}, bit_or({BIT}),
+           bit_or(CASE WHEN "Status" = 'present' THEN {BIT} ELSE 0 END)
+    FROM {source}
+    GROUP BY 1, 2
+    ON CONFLICT ("EnrollmentID", "Month") DO UPDATE SET
+      "Held"    = "AttendanceBits"."Held" | excluded."Held",
+      "Present" = ("AttendanceBits"."Present" & ~excluded."Held") | excluded."Present";"""
+
+def _bits_clear(source):
+    return f"""
+    UPDATE "AttendanceBits" b
+    SET "Held" = b."Held" & ~d.bits, "Present" = b."Present" & ~d.bits
+    FROM (SELECT "EnrollmentID", {MONTH} AS "Month", bit_or({BIT}) AS bits
+          FROM {source} GROUP BY 1, 2) d
+    WHERE b."EnrollmentID" = d."EnrollmentID" AND b."Month" = d."Month";"""
+
+def _function(name, body, returns='NULL'):
+    return f"""
+    CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN{body}
+      RETURN {returns};
+    END $$"""
+
+# the per-row SQLite triggers become one call per statement; a row in
+# RollupDeferred (see the bulk paths) still switches them off
+_DEFERRED = """
+      IF EXISTS (SELECT 1 FROM RollupDeferred) THEN
+        RETURN NULL;
+      END IF;"""
+
+FUNCTIONS = [
+    _function('attendance_check', """
+      IF NEW."Status" NOT IN ('present', 'absent') THEN
+        RAISE EXCEPTION 'Invalid attendance status' USING ERRCODE = 'check_violation';
+      END IF;
+      -- archived terms are read-only; their rows live in the term's file
+      IF EXISTS (SELECT 1 FROM "ArchivedTerms"
+                 WHERE NEW."Date" BETWEEN "StartDate" AND "EndDate") THEN
+        RAISE EXCEPTION 'Attendance for an archived term is read-only' USING ERRCODE = 'check_violation';
+      END IF;""", returns='NEW'),
+    _function('attendance_rollup_insert',
+              _DEFERRED + _upsert_counts(_rows('new_rows', 1)) + _bits_set('new_rows')),
+    _function('attendance_rollup_update',
+              _DEFERRED + _upsert_counts(f"{_rows('old_rows', -1)} UNION ALL {_rows('new_rows', 1)}")
+              + _bits_clear('old_rows') + _bits_set('new_rows')),
+    _function('attendance_rollup_delete',
+              _DEFERRED + _upsert_counts(_rows('old_rows', -1)) + _bits_clear('old_rows')),
+    # BEFORE, so the Enrollments row is still there for the summary lookup
+    _function('enrollment_rollup_delete', """
+      DELETE FROM "Attendance" WHERE "EnrollmentID" = OLD."EnrollmentID";
+      DELETE FROM "AttendanceCounts" WHERE "EnrollmentID" = OLD."EnrollmentID";
+      DELETE FROM "AttendanceBits" WHERE "EnrollmentID" = OLD."EnrollmentID";""", returns='OLD'),
+]
+
+# (name, table, definition); always recreated, as on SQLite
+TRIGGERS = [
+    ('trg_attendance_check', '"Attendance"',
+     'BEFORE INSERT ON "Attendance" FOR EACH ROW EXECUTE FUNCTION attendance_check()'),
+    ('trg_counts_attendance_insert', '"Attendance"',
+     'AFTER INSERT ON "Attendance" REFERENCING NEW TABLE AS new_rows '
+     'FOR EACH STATEMENT EXECUTE FUNCTION attendance_rollup_insert()'),
+    ('trg_counts_attendance_update', '"Attendance"',
+     'AFTER UPDATE ON "Attendance" REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+     'FOR EACH STATEMENT EXECUTE FUNCTION attendance_rollup_update()'),
+    ('trg_counts_attendance_delete', '"Attendance"',
+     'AFTER DELETE ON "Attendance" REFERENCING OLD TABLE AS old_rows '
+     'FOR EACH STATEMENT EXECUTE FUNCTION attendance_rollup_delete()'),
+    ('trg_counts_enrollment_delete', '"Enrollments"',
+     'BEFORE DELETE ON "Enrollments" FOR EACH ROW EXECUTE FUNCTION enrollment_rollup_delete()'),
+]
+
+# User search: ILIKE '%term%' on either column is a trigram index scan.
+# CREATE EXTENSION needs a role allowed to create it (or an admin to run it
+# once); where pg_trgm isn't installed at all, searches are sequential scans.
+USER_SEARCH_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    'CREATE INDEX IF NOT EXISTS ix_users_name_trgm ON "Users" USING gin ("Name" gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON "Users" USING gin ("Username" gin_trgm_ops)',
+]
+
+def create_triggers():
+    conn = db.session.connection()
+    if conn.exec_driver_sql("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'").scalar():
+        for sql in USER_SEARCH_SQL:
+            conn.exec_driver_sql(sql)
+    for sql in FUNCTIONS:
+        conn.exec_driver_sql(sql)
+    for name, table_name, definition in TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name} ON {table_name}")
+        conn.exec_driver_sql(f"CREATE TRIGGER {name} {definition}")
+
+def copy_rows(conn, table_name, columns, rows):
+    # COPY ... FROM STDIN on `conn`'s own DBAPI connection, so the rows are
+    # part of its transaction. psycopg 3 streams rows; psycopg2 takes CSV.
+    quote = conn.dialect.identifier_preparer.quote
+    sql = f"COPY {quote(table_name)} ({', '.join(map(quote, columns))}) FROM STDIN"
+    cursor = conn.connection.cursor()
+    try:
+        if hasattr(cursor, 'copy'):
+            with cursor.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            buf = StringIO()
+            csv.writer(buf).writerows(rows)
+            buf.seek(0)
+            cursor.copy_expert(sql + " WITH (FORMAT csv)", buf)
+    finally:
+        cursor.close()
+
+def reset_sequences(conn):
+    # after rows were loaded with explicit ids (seed_data), so the next
+    # INSERT doesn't collide with them
+    quote = conn.dialect.identifier_preparer.quote
+    for table in db.metadata.sorted_tables:
+        col = table.autoincrement_column
+        if col is not None:
+            conn.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{quote(table.name)}', '{col.name}'), "
+                f"COALESCE(MAX({quote(col.name)}), 0) + 1, false) FROM {quote(table.name)}")
+
+# Bulk path for imports, as bulk_upsert_attendance in app.py: stage, apply
+# the rollup deltas set-based, then upsert Attendance with the triggers
+# deferred. Temp tables are per session, so imports don't see each other's.
+STAGE_SQL = [
+    """CREATE TEMP TABLE IF NOT EXISTS attendance_import (
+        "EnrollmentID" INTEGER, "Date" DATE, "Status" VARCHAR(20), PRIMARY KEY ("EnrollmentID", "Date"))""",
+    """CREATE TEMP TABLE IF NOT EXISTS attendance_delta (
+        "EnrollmentID" INTEGER PRIMARY KEY, "PresentCount" INTEGER, "AbsentCount" INTEGER, "TotalCount" INTEGER)""",
+    "TRUNCATE attendance_import, attendance_delta",
+]
+
+BULK_ATTENDANCE_SQL = [
+    # temp tables are never analyzed automatically
+    "ANALYZE attendance_import",
+    """
+    INSERT INTO attendance_delta
+    SELECT s."EnrollmentID",
+           COUNT(*) FILTER (WHERE s."Status" = 'present') - COUNT(*) FILTER (WHERE a."Status" = 'present'),
+           COUNT(*) FILTER (WHERE s."Status" = 'absent')  - COUNT(*) FILTER (WHERE a."Status" = 'absent'),
+           COUNT(*) FILTER (WHERE a."EnrollmentID" IS NULL)
+    FROM attendance_import s
+    LEFT JOIN "Attendance" a ON a."EnrollmentID" = s."EnrollmentID" AND a."Date" = s."Date"
+    GROUP BY s."EnrollmentID"
+    HAVING bool_or(s."Status" IS DISTINCT FROM a."Status")
+    """,
+    """
+    INSERT INTO "AttendanceCounts" ("EnrollmentID", "PresentCount", "AbsentCount", "TotalCount")
+    SELECT * FROM attendance_delta
+    ON CONFLICT ("EnrollmentID") DO UPDATE SET
+      "PresentCount" = "AttendanceCounts"."PresentCount" + excluded."PresentCount",
+      "AbsentCount"  = "AttendanceCounts"."AbsentCount"  + excluded."AbsentCount",
+      "TotalCount"   = "AttendanceCounts"."TotalCount"   + excluded."TotalCount"
+    """,
+    """
+    INSERT INTO "AttendanceSummary" ("ClassID", "StudentID", "PresentCount", "AbsentCount", "TotalCount")
+    SELECT e."ClassID", e."StudentID", SUM(d."PresentCount"), SUM(d."AbsentCount"), SUM(d."TotalCount")
+    FROM attendance_delta d JOIN "Enrollments" e ON e."EnrollmentID" = d."EnrollmentID"
+    GROUP BY e."ClassID", e."StudentID"
+    ON CONFLICT ("ClassID", "StudentID") DO UPDATE SET
+      "PresentCount" = "AttendanceSummary"."PresentCount" + excluded."PresentCount",
+      "AbsentCount"  = "AttendanceSummary"."AbsentCount"  + excluded."AbsentCount",
+      "TotalCount"   = "AttendanceSummary"."TotalCount"   + excluded."TotalCount"
+    """,
+    """
+    INSERT INTO "ClassSessions" ("ClassID", "Date", "PresentCount", "AbsentCount")
+    SELECT e."ClassID", s."Date",
+           COUNT(*) FILTER (WHERE s."Status" = 'present') - COUNT(*) FILTER (WHERE a."Status" = 'present'),
+           COUNT(*) FILTER (WHERE s."Status" = 'absent')  - COUNT(*) FILTER (WHERE a."Status" = 'absent')
+    FROM attendance_import s
+    JOIN "Enrollments" e ON e."EnrollmentID" = s."EnrollmentID"
+    LEFT JOIN "Attendance" a ON a."EnrollmentID" = s."EnrollmentID" AND a."Date" = s."Date"
+    GROUP BY e."ClassID", s."Date"
+    ON CONFLICT ("ClassID", "Date") DO UPDATE SET
+      "PresentCount" = "ClassSessions"."PresentCount" + excluded."PresentCount",
+      "AbsentCount"  = "ClassSessions"."AbsentCount"  + excluded."AbsentCount"
+    """,
+    _bits_set('attendance_import'),
+    "INSERT INTO RollupDeferred VALUES (1)",
+    """
+    INSERT INTO "Attendance" ("EnrollmentID", "Date", "Status")
+    SELECT "EnrollmentID", "Date", "Status" FROM attendance_import
+    ON CONFLICT ("EnrollmentID", "Date") DO UPDATE SET "Status" = excluded."Status"
+    WHERE "Attendance"."Status" IS DISTINCT FROM excluded."Status"
+    """,
+    "DELETE FROM RollupDeferred",
+]
+
+def bulk_upsert_attendance(rows):
+    # rows are (EnrollmentID, 'YYYY-MM-DD', status); a repeated key keeps
+    # its last status, which COPY into a keyed table can't do by itself
+    latest = {(eid, day): status for eid, day, status in rows}
+    conn = db.session.connection()
+    for sql in STAGE_SQL:
+        conn.exec_driver_sql(sql)
+    copy_rows(conn, 'attendance_import', ('EnrollmentID', 'Date', 'Status'),
+              [(eid, day, status) for (eid, day), status in latest.items()])
+    for sql in BULK_ATTENDANCE_SQL:
+        conn.exec_driver_sql(sql)
@@ -0,0 +1,132 @@
+# roster.py
+# Bulk user provisioning. Records are
+#   {"username": "11001", "password": "...", "name": "Emma Davis", "role": "student",
+#    "classes": ["CSC 1001", 7]}            (CSV: classes as "CSC 1001;7")
+# plus optional major / graduation_year (students) and department (teachers).
+# The whole file is validated before anything is written; a file with any
+# bad record is rejected as a unit. Valid files are written chunk_users
+# accounts at a time: passwords hashed across the hasher's process pool,
+# then Users, Student/Teacher/Admin and Enrollments inserted with one
+# executemany each and one commit per chunk.
+import time
+from datetime import date
+from sqlalchemy import select
+from app import db, hasher, response_cache, User, Student, Teacher, Admin, Enrollments
+from ingest import MAX_ERRORS, load_classes, resolve_class
+
+ROLES       = ('student', 'teacher', 'admin')
+CHUNK_USERS = 1000
+
+def split_classes(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return value
+    return [c for c in str(value).split(';') if c.strip()]
+
+class RosterImport:
+    def __init__(self, chunk_users=CHUNK_USERS, max_errors=MAX_ERRORS, progress=None):
+        # progress(done, total) is called after every committed chunk
+        self.chunk_users = chunk_users
+        self.max_errors  = max_errors
+        self.progress    = progress
+        self.teachers, self.class_ids = load_classes()
+        self.taken  = set(db.session.scalars(select(User.Username)))
+        self.report = {'received': 0, 'valid': 0, 'created': 0, 'enrollments': 0,
+                       'failed': 0, 'errors': [], 'dry_run': False}
+
+    def fail(self, line, message):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < self.max_errors:
+            self.report['errors'].append({'line': line, 'error': message})
+
+    def check(self, rec):
+        # -> cleaned user dict or an error message
+        if not isinstance(rec, dict):
+            return 'record is not an object'
+        username = str(rec.get('username') or '').strip()
+        name     = str(rec.get('name') or '').strip()
+        password = str(rec.get('password') or '')
+        role     = str(rec.get('role') or '').strip().lower()
+        if not username or len(username) > 50:
+            return 'username is required (at most 50 characters)'
+        if username in self.taken:
+            return f'username {username!r} already exists'
+        if not name or len(name) > 100:
+            return 'name is required (at most 100 characters)'
+        if not password:
+            return 'password is required'
+        if role not in ROLES:
+            return f'role must be one of {", ".join(ROLES)}'
+        classes = split_classes(rec.get('classes'))
+        if classes and role != 'student':
+            return 'only students can be enrolled in classes'
+        class_ids = []
+        for cls in classes:
+            class_id = resolve_class(cls, self.teachers, self.class_ids)
+            if class_id is None:
+                return f'unknown or ambiguous class {cls!r}'
+            if class_id not in class_ids:
+                class_ids.append(class_id)
+        year = rec.get('graduation_year') or None
+        if year is not None and not str(year).strip().isdigit():
+            return f'invalid graduation_year {year!r}'
+        return {'username': username, 'name': name, 'password': password, 'role': role,
+                'classes': class_ids, 'graduation_year': int(year) if year else None,
+                'major': rec.get('major') or None, 'department': rec.get('department') or None}
+
+    def validate(self, records):
+        users = []
+        for line, rec in records:
+            self.report['received'] += 1
+            user = rec if isinstance(rec, str) else self.check(rec)
+            if isinstance(user, str):
+                self.fail(line, user)
+                continue
+            self.taken.add(user['username'])    # catches duplicates within the file
+            users.append(user)
+        self.report['valid'] = len(users)
+        return users
+
+    def run(self, records, dry_run=False):
+        began = time.perf_counter()
+        users = self.validate(records)
+        self.report['dry_run'] = dry_run
+        if not dry_run and not self.report['failed']:
+            for i in range(0, len(users), self.chunk_users):
+                self.insert(users[i:i + self.chunk_users])
+                if self.progress:
+                    self.progress(self.report['created'], len(users))
+        else:
+            self.report['enrollments'] = sum(len(u['classes']) for u in users)
+        self.report['seconds'] = round(time.perf_counter() - began, 3)
+        return self.report
+
+    def insert(self, users):
+        today  = date.today()
+        hashes = hasher.hash_many([u['password'] for u in users])
+        users_table = User.__table__
+        user_ids = db.session.execute(
+            users_table.insert().returning(users_table.c.UserID, sort_by_parameter_order=True),
+            [{'Username': u['username'], 'Password': pw, 'Name': u['name'], 'Role_Type': u['role']}
+             for u, pw in zip(users, hashes)]).scalars().all()
+        students, teachers, admins, enrollments = [], [], [], []
+        for uid, u in zip(user_ids, users):
+            if u['role'] == 'student':
+                students.append({'UserID': uid, 'EnrollmentDate': today,
+                                 'GraduationYear': u['graduation_year'], 'MajorField': u['major']})
+                enrollments.extend({'StudentID': uid, 'ClassID': c, 'Status': 'active',
+                                    'EnrollDate': today} for c in u['classes'])
+            elif u['role'] == 'teacher':
+                teachers.append({'UserID': uid, 'HireDate': today, 'Department': u['department']})
+            else:
+                admins.append({'UserID': uid})
+        for model, rows in ((Student, students), (Teacher, teachers),
+                            (Admin, admins), (Enrollments, enrollments)):
+            if rows:
+                db.session.execute(model.__table__.insert(), rows)
+        db.session.commit()
+        self.report['created']     += len(users)
+        self.report['enrollments'] += len(enrollments)
+        # shared versions, as in AttendanceImport.flush
+        response_cache.bump('report', *{f'class:{e["ClassID"]}' for e in enrollments})
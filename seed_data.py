@@ -1,8 +1,8 @@
 # seed_data.py
-from app import app, db, User, Admin, Teacher, Student, Classes, Enrollments
-from werkzeug.security import generate_password_hash
-from datetime import date
+from app import app, db, create_schema, drop_schema, hasher, DB_BACKEND
+from datetime import date, timedelta
 import random
+import time
 
 # Name pools
 prof_first = ['Alice','Bob','Carol','David','Eva']
@@ -13,98 +13,153 @@ stud_last  = ['Miller','Davis','Garcia','Rodriguez','Wilson','Martinez','Anderso
 # Course code prefixes
 course_codes = ['CSC','FIN','MAT','PHY','HIS']
 
-with app.app_context():
-    # 1) Rebuild schema
-    db.drop_all()
-    db.create_all()
-
-    # 2) Seed Admin
-    admin_user = User(
-        Username='00001',
-        Password=generate_password_hash('adminpass'),
-        Name='Site Administrator',
-        Role_Type='admin'
-    )
-    db.session.add(admin_user)
-    db.session.commit()
-    db.session.add(
-        Admin(
-            UserID=admin_user.UserID,
-            AdminLevel=1,
-            OfficeLocation='HQ Office',
-            Responsibilities='Full system administration'
-        )
-    )
-    db.session.commit()
-
-    # 3) Seed Professors (5) and Classes (20)
-    prof_users = []
-    for i in range(5):
-        # Unique 5-digit ID
-        prof_id = f"{10000 + i + 1:05d}"
-        full_name = f"{prof_first[i]} {prof_last[i]}"
-        # Create User+Teacher
-        pu = User(
-            Username=prof_id,
-            Password=generate_password_hash('password'),
-            Name=full_name,
-            Role_Type='teacher'
-        )
-        db.session.add(pu)
-        db.session.commit()
-        prof_users.append(pu)
-
-        t = Teacher(UserID=pu.UserID, HireDate=date(2020,1,i+1),
-                    Department=f"Department {i+1}", Rank='Professor')
-        db.session.add(t)
-        db.session.commit()
-
-    # Now create 20 classes, assigning them evenly to the 5 profs
-    classes = []
-    for idx in range(20):
-        code = course_codes[idx % len(course_codes)]
-        num  = 1001 + idx
-        cls = Classes(
-            ClassName=f"{code} {num}",
-            TeacherID=prof_users[idx % len(prof_users)].UserID,
-            Description=f"Description for {code} {num}",
-            Schedule='Mon & Wed 10:00-11:30'
-        )
-        db.session.add(cls)
-        db.session.commit()
-        classes.append(cls)
-
-    # 4) Seed 50 Students
-    student_users = []
-    for j in range(50):
-        stud_id = f"{11000 + j + 1:05d}"
-        full_name = f"{random.choice(stud_first)} {random.choice(stud_last)}"
-        su = User(
-            Username=stud_id,
-            Password=generate_password_hash('password'),
-            Name=full_name,
-            Role_Type='student'
-        )
-        db.session.add(su)
-        db.session.commit()
-        student_users.append(su)
-
-        st = Student(UserID=su.UserID, EnrollmentDate=date.today(),
-                     GraduationYear=2027, MajorField='General Studies')
-        db.session.add(st)
-        db.session.commit()
-
-    # 5) Enroll each student in 5 *distinct* random classes
-    for su in student_users:
-        chosen = random.sample(classes, 5)
-        for cls in chosen:
-            e = Enrollments(
-                StudentID=su.UserID,
-                ClassID=cls.ClassID,
-                Status='active',
-                EnrollDate=date.today()
-            )
-            db.session.add(e)
-    db.session.commit()
+# Meeting patterns: label and weekdays (Mon=0)
+schedules = [('Mon & Wed 10:00-11:30',     (0, 2)),
+             ('Tue & Thu 13:00-14:30',     (1, 3)),
+             ('Mon, Wed & Fri 09:00-10:00', (0, 2, 4))]
 
+# rows per executemany / commit
+CHUNK_ROWS = 200_000
+
+def generate_dataset(students=50, classes=20, teachers=5, per_student=5,
+                     days=28, start=None, seed=None, log=print):
+    # Rebuild the database with synthetic users, classes, enrollments and
+    # `days` calendar days of attendance. Same seed + start => same data.
+    if per_student > classes:
+        raise ValueError('per_student cannot exceed the number of classes')
+    rng   = random.Random(seed)
+    start = start or date.today() - timedelta(days=days)
+    began = time.perf_counter()
+
+    # one hash per distinct password, shared by every account that uses it
+    admin_pw = hasher.hash('adminpass')
+    user_pw  = hasher.hash('password')
+
+    teacher_ids = range(2, 2 + teachers)
+    student_ids = range(2 + teachers, 2 + teachers + students)
+    # demo-compatible logins: profs 10001.., students 11001.. (shifted past the profs)
+    student_base = 10001 + max(teachers, 1000)
+    counts = {}
+
+    with db.engine.connect() as conn:
+        # bulk load with no triggers (and on SQLite no FK checks; tables are
+        # loaded parents first either way); create_schema() below adds the
+        # triggers back and rebuilds the rollups in one pass
+        if DB_BACKEND == 'sqlite':
+            conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        drop_schema(conn)
+        db.metadata.create_all(conn)
+        conn.commit()
+
+        def write(table, columns, chunk):
+            # each backend's fastest bulk load: COPY on PostgreSQL, executemany on SQLite
+            if DB_BACKEND == 'postgresql':
+                from postgres import copy_rows
+                copy_rows(conn, table, columns, chunk)
+            else:
+                conn.exec_driver_sql(f'INSERT INTO {table} ({", ".join(columns)}) '
+                                     f'VALUES ({", ".join("?" * len(columns))})', chunk)
+            conn.commit()
+
+        def insert(table, columns, rows):
+            chunk, total = [], 0
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == CHUNK_ROWS:
+                    write(table, columns, chunk)
+                    total += len(chunk)
+                    chunk = []
+            if chunk:
+                write(table, columns, chunk)
+                total += len(chunk)
+            counts[table] = counts.get(table, 0) + total
+
+        user_cols = ('UserID', 'Username', 'Password', 'Name', 'Role_Type')
+        insert('Users', user_cols, [(1, '00001', admin_pw, 'Site Administrator', 'admin')])
+        insert('Admin', ('UserID', 'AdminLevel', 'OfficeLocation', 'Responsibilities'),
+               [(1, 1, 'HQ Office', 'Full system administration')])
+
+        insert('Users', user_cols, (
+            (uid, f'{10001 + i:05d}', user_pw,
+             f'{prof_first[i % len(prof_first)]} {prof_last[(i + i // len(prof_first)) % len(prof_last)]}',
+             'teacher')
+            for i, uid in enumerate(teacher_ids)))
+        insert('Teacher', ('UserID', 'HireDate', 'Department', 'Rank'), (
+            (uid, (date(2020, 1, 1) + timedelta(days=i)).isoformat(),
+             f'Department {i % 20 + 1}', 'Professor')
+            for i, uid in enumerate(teacher_ids)))
+
+        class_days = []
+        def class_rows():
+            for idx in range(classes):
+                code = course_codes[idx % len(course_codes)]
+                label, weekdays = schedules[rng.randrange(len(schedules))]
+                class_days.append(weekdays)
+                yield (idx + 1, f'{code} {1001 + idx}', teacher_ids[idx % teachers],
+                       f'Description for {code} {1001 + idx}', label)
+        insert('Classes', ('ClassID', 'ClassName', 'TeacherID', 'Description', 'Schedule'),
+               class_rows())
+
+        insert('Users', user_cols, (
+            (uid, f'{student_base + i:05d}', user_pw,
+             f'{rng.choice(stud_first)} {rng.choice(stud_last)}', 'student')
+            for i, uid in enumerate(student_ids)))
+        insert('Student', ('UserID', 'EnrollmentDate', 'GraduationYear', 'MajorField'), (
+            (uid, start.isoformat(), 2027 + i % 4, 'General Studies')
+            for i, uid in enumerate(student_ids)))
+
+        # Each student takes `per_student` distinct classes and gets a personal
+        # attendance propensity: most attend ~90%, a minority are chronically absent.
+        enrolled = []
+        def enrollment_rows():
+            eid = 0
+            for uid in student_ids:
+                if rng.random() < 0.08:
+                    propensity = rng.betavariate(2, 2)
+                else:
+                    propensity = rng.betavariate(12, 1.2)
+                for c in rng.sample(range(classes), per_student):
+                    eid += 1
+                    enrolled.append((eid, c, propensity))
+                    yield (eid, uid, c + 1, 'active', start.isoformat())
+        insert('Enrollments', ('EnrollmentID', 'StudentID', 'ClassID', 'Status', 'EnrollDate'),
+               enrollment_rows())
+
+        # Day effects shared by every class: Fridays run a little lower and
+        # roughly one day in thirty is a bad day (weather, flu).
+        calendar = []
+        for d in range(days):
+            day = start + timedelta(days=d)
+            factor = 0.95 if day.weekday() == 4 else 1.0
+            if rng.random() < 0.033:
+                factor *= 0.8
+            calendar.append((day.weekday(), day.isoformat(), factor))
+
+        sessions = [[(day, factor) for weekday, day, factor in calendar if weekday in weekdays]
+                    for weekdays in class_days]
+
+        # enrollment-major, date-minor: matches the (EnrollmentID, Date) key,
+        # so the primary key index is built by appending
+        def attendance_rows():
+            rnd = rng.random
+            for eid, c, propensity in enrolled:
+                for day, factor in sessions[c]:
+                    yield (eid, day, 'present' if rnd() < propensity * factor else 'absent')
+        insert('Attendance', ('EnrollmentID', 'Date', 'Status'), attendance_rows())
+        if DB_BACKEND == 'postgresql':
+            from postgres import reset_sequences
+            reset_sequences(conn)
+            conn.commit()
+        else:
+            conn.exec_driver_sql('PRAGMA foreign_keys=ON')
+
+    create_schema()
+    log(f"Seeded {counts['Users']} users, {counts['Classes']} classes, "
+        f"{counts['Enrollments']} enrollments and {counts['Attendance']} attendance rows "
+        f"in {time.perf_counter() - began:.1f}s.")
+    return counts
+
+if __name__ == '__main__':
+    with app.app_context():
+        generate_dataset()
     print("✅ Seed complete: 1 admin, 5 profs, 20 classes, 50 students, each student in 5 classes.")